@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from main import MRR
+from pricing import Repricer
+from scheduler import DEFAULT_LIMITS, Scheduler
+
+# Secrets may be left out of the config and kept in the system keyring instead
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+KEYRING_SERVICE = "mrr"
+
+
+# One account from the config: {"key": ..., "secret": ..., "pool_size": 4,
+# "limits": {"default": [5, 10]}}. key/secret may instead name environment
+# variables (key_env/secret_env); a missing secret is looked up in the keyring.
+class Account:
+    __slots__ = ('name', 'key', 'secret', 'pool_size', 'limits')
+
+    def __init__(self, name, key, secret=None, pool_size=4, limits=None):
+        self.name = name
+        self.key = key
+        self.secret = secret
+        self.pool_size = pool_size
+        self.limits = {group: tuple(limit) for group, limit in (limits or DEFAULT_LIMITS).items()}
+
+    @classmethod
+    def from_config(cls, name, entry):
+        key = entry.get('key') or os.environ.get(entry.get('key_env', ''), '')
+        secret = entry.get('secret') or os.environ.get(entry.get('secret_env', '')) or None
+        return cls(name, key, secret, entry.get('pool_size', 4), entry.get('limits'))
+
+    def credentials(self):
+        secret = self.secret
+        if secret is None and keyring is not None:
+            secret = keyring.get_password(KEYRING_SERVICE, self.name)
+        if not self.key or not secret:
+            raise ValueError("account %s: no key or secret" % self.name)
+        return self.key, secret
+
+
+# Named accounts with an MRR client each, built on first use: a scheduler
+# holding the account to its own rate budget and its own pooled session
+class Accounts:
+    def __init__(self, accounts):
+        self.accounts = {account.name: account for account in accounts}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    # {"accounts": {name: entry}} json file, see Account.from_config
+    @classmethod
+    def load(cls, path):
+        with open(path) as config:
+            entries = json.load(config)['accounts']
+        return cls(Account.from_config(name, entry) for name, entry in entries.items())
+
+    @property
+    def names(self):
+        return list(self.accounts)
+
+    def client(self, name):
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                account = self.accounts[name]
+                client = MRR(*account.credentials(), pool_size=account.pool_size)
+                client.scheduler = Scheduler(account.limits)
+                self._clients[name] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Run operation(client) for every account (or `names`) at once, yielding
+    # {'account': name, 'result': ...} or {'account': name, 'error': ...} as each finishes
+    def each(self, operation, names=None, workers=8):
+        names = self.names if names is None else list(names)
+        if not names:
+            return
+
+        def run(name):
+            return operation(self.client(name))
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(names))) as pool:
+            futures = {pool.submit(run, name): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    yield {'account': futures[future], 'result': future.result()}
+                except Exception as error:
+                    yield {'account': futures[future], 'error': repr(error)}
+
+    # Like each() for operations returning an iterable (e.g. client.iter_rentals()),
+    # merging the records of every account into one stream as they arrive
+    def stream(self, operation, names=None, workers=8):
+        names = self.names if names is None else list(names)
+        records = queue.Queue(maxsize=1000)
+        done = object()
+        stop = threading.Event()
+
+        def run(name):
+            try:
+                for record in operation(self.client(name)):
+                    if stop.is_set():
+                        break
+                    records.put({'account': name, 'record': record})
+            except Exception as error:
+                records.put({'account': name, 'error': repr(error)})
+            finally:
+                records.put(done)
+
+        running = len(names)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names)))) as pool:
+            for name in names:
+                pool.submit(run, name)
+            try:
+                while running:
+                    item = records.get()
+                    if item is done:
+                        running -= 1
+                    else:
+                        yield item
+            finally:
+                # The caller stopped early: let the workers finish and drain what they queue
+                stop.set()
+                while running:
+                    if records.get() is done:
+                        running -= 1
+
+
+# Operations the command line can run across accounts: (streamed, operation)
+OPERATIONS = {
+    'balance': (False, lambda client, args: client.get("/account/balance")),
+    'rigs': (True, lambda client, args: client.iter_my_rigs()),
+    'rentals': (True, lambda client, args: client.iter_rentals(type=args.type, history=args.history)),
+    'reprice': (False, lambda client, args: Repricer(client, args.currency, args.multiplier).reprice(dry_run=args.dry_run)),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-accounts", description="Run one operation across many MRR accounts at once")
+    parser.add_argument('config', help='json file: {"accounts": {"name": {"key": ..., "secret": ...}}}')
+    parser.add_argument('operation', choices=sorted(OPERATIONS))
+    parser.add_argument('--only', action='append', help='account to include, repeatable (default: all)')
+    parser.add_argument('--workers', type=int, default=8, help='accounts worked on at once')
+    parser.add_argument('--type', default='renter', help='rentals: renter or owner')
+    parser.add_argument('--history', action='store_true', help='rentals: include finished rentals')
+    parser.add_argument('--currency', default='BTC', help='reprice: currency to price in')
+    parser.add_argument('--multiplier', type=float, default=1.0, help='reprice: multiple of the suggested price')
+    parser.add_argument('--dry-run', action='store_true', help='reprice: plan without sending')
+    args = parser.parse_args(argv)
+    streamed, operation = OPERATIONS[args.operation]
+    failed = 0
+    with Accounts.load(args.config) as accounts:
+        run = accounts.stream if streamed else accounts.each
+        for line in run(lambda client: operation(client, args), args.only, args.workers):
+            failed += 'error' in line
+            print(json.dumps(line, default=str), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import asyncio
+
+import aiohttp
+
+from main import MRR, Signer
+
+
+class AsyncMRR:
+    # Root URI for the api
+    root_uri = MRR.root_uri
+
+    decode = True
+
+    def __init__(self, key, secret, concurrency=10, timeout=30):
+        self.key = key
+        self.secret = secret
+        self.signer = Signer(key, secret)
+        # Upper bound on requests in flight at once
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    # Pooled aiohttp session, built on first use inside the running loop
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # Raw query function -- signed exactly like MRR.query
+    async def query(self, type, endpoint, parms={}):
+        async with self.semaphore:
+            # Sign inside the semaphore so the nonce is fresh when the request goes out
+            uri, headers = self.signer.sign(self.root_uri, endpoint)
+            async with self.session.request(type, uri, headers=headers, json=parms) as response:
+                text = await response.text()
+
+        return {
+            'status': response.status,
+            'header': response.headers,
+            'data': text
+        }
+
+    parse_return = MRR.parse_return
+
+    # Helper aliases just to make things easier
+    async def get(self, endpoint, parms={}):
+        return self.parse_return(await self.query("GET", endpoint, parms))
+
+    async def post(self, endpoint, parms={}):
+        return self.parse_return(await self.query("POST", endpoint, parms))
+
+    async def put(self, endpoint, parms={}):
+        return self.parse_return(await self.query("PUT", endpoint, parms))
+
+    async def delete(self, endpoint, parms={}):
+        return self.parse_return(await self.query("DELETE", endpoint, parms))
+
+    async def _tagged(self, call):
+        type, endpoint, *parms = call
+        return call, self.parse_return(await self.query(type, endpoint, *parms))
+
+    # Run many (type, endpoint[, parms]) calls and yield (call, result) as each finishes
+    async def gather_many(self, calls):
+        tasks = [asyncio.ensure_future(self._tagged(call)) for call in calls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,628 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import endpoints
+import fastjson
+import graph
+from accounts import Account, Accounts
+from async_mrr import AsyncMRR
+from feed import Feed
+from main import MRR, LogSink, Signer
+from metrics import Metrics
+from pools import PoolChecker, matrix
+from pricing import Repricer, market_snapshot
+from procure import Procurer, optimize, rental_cost
+from replay import Recorder, StubHandler, load, replay_server, stub_server
+from scanner import Scanner
+from scheduler import Scheduler
+
+
+def timed(fn, n):
+    begin = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - begin) / n
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds * 1e6:10.1f} us/call")
+
+
+# Fresh connection per call (the old requests.request path) vs the pooled session
+def bench_session(n=500):
+    server = stub_server()
+    uri = server.url + "/whoami"
+    report("requests.request per call", timed(lambda: requests.request("GET", uri, json={}), n))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        report("MRR pooled session", timed(lambda: mrr.get("/whoami"), n))
+    server.shutdown()
+
+
+# Sequential MRR calls vs AsyncMRR.gather_many fan-out against a slow stub
+def bench_async(n=200, latency=0.02, concurrency=20):
+    server = stub_server(latency=latency)
+    endpoints = ["/rig/%d/threads" % i for i in range(n)]
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        begin = time.perf_counter()
+        for endpoint in endpoints:
+            mrr.get(endpoint)
+        report("MRR sequential", (time.perf_counter() - begin) / n)
+
+    async def fan_out():
+        async with AsyncMRR("key", "secret", concurrency=concurrency) as client:
+            client.root_uri = server.url
+            async for _ in client.gather_many(("GET", endpoint) for endpoint in endpoints):
+                pass
+
+    begin = time.perf_counter()
+    asyncio.run(fan_out())
+    report("AsyncMRR gather_many (%d in flight)" % concurrency, (time.perf_counter() - begin) / n)
+    server.shutdown()
+
+
+# Echo one record per id for multi-id paths like /rig/1;2;3/threads
+def ids_responder(method, path, body):
+    ids = path.split("/")[-2].split(";")
+    return 200, {'success': True, 'data': [{'rigid': id, 'threads': []} for id in ids]}
+
+
+# One call per id vs MRR.batch_get chunking the same ids
+def bench_batch(n=1000, latency=0.005):
+    server = stub_server(ids_responder, latency=latency)
+    ids = list(range(n))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        begin = time.perf_counter()
+        for id in ids:
+            mrr.get("/rig/%d/threads" % id)
+        report("one call per id", (time.perf_counter() - begin) / n)
+        begin = time.perf_counter()
+        result = mrr.batch_get("/rig/{ids}/threads", ids)
+        assert len(result['data']) == n
+        report("MRR.batch_get (%d chunks)" % len(mrr.chunk_ids(ids)), (time.perf_counter() - begin) / n)
+    server.shutdown()
+
+
+# A /rig/{id}/graph chartdata record covering `weeks` of 5 minute bars
+def synthetic_graph(weeks=4, step=300000):
+    begin = 1690000000000
+    stamps = range(begin, begin + weeks * 7 * 86400000, step)
+    bars = ",".join("[%d,%.4f]" % (t, random.uniform(90, 110)) for t in stamps)
+    rejected = ",".join("[%d,%.4f]" % (t, random.uniform(0, 2)) for t in stamps)
+    offline = ",".join("%d:%d" % (t, t + 1800000) for t in stamps[::500])
+    return {'bars': bars, 'average': bars, 'rejected': rejected,
+            'rentals': offline, 'offline': offline, 'pooloffline': ""}
+
+
+# graph.parse_graph + window helpers vs json-decoding the pairs into lists
+def bench_graph(rigs=200, weeks=4):
+    record = synthetic_graph(weeks)
+
+    def naive():
+        bars, average, rejected = (json.loads("[" + record[field] + "]") for field in graph.SERIES_FIELDS)
+        offline = [tuple(map(int, p.split(":"))) for p in record['offline'].split(",")]
+        return sum(v for _, v in bars) / len(bars), sum(v for _, v in rejected), average, offline
+
+    def columnar():
+        parsed = graph.parse_graph(record)
+        return graph.average_hashrate(parsed.bars), graph.rejected_ratio(parsed), graph.uptime(parsed), parsed
+
+    for name, fn in (("lists of pairs", naive), ("graph.parse_graph", columnar)):
+        tracemalloc.start()
+        kept = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del kept
+        report("%s, %d week graph" % (name, weeks), timed(fn, rigs))
+        print(f"{'':<40} {peak / 2**20:10.1f} MiB peak")
+
+
+# `n` /rig search records with random prices (BTC per TH/day), hashrates and hours
+def synthetic_rigs(n, algo='sha256'):
+    return [{
+        'id': id,
+        'type': algo,
+        'status': {'status': random.choice(('available', 'available', 'rented')), 'online': True},
+        'price': {'type': 'th', 'BTC': {'currency': 'BTC', 'price': "%.8f" % random.uniform(1e-5, 1e-4)}},
+        'minhours': random.choice(("2", "3", "4")),
+        'maxhours': random.choice(("12", "24", "48", "120")),
+        'rpi': "%.1f" % random.uniform(40, 100),
+        'hashrate': {'advertised': {'hash': random.uniform(1, 500), 'type': 'th'}},
+    } for id in range(n)]
+
+
+# Serve a /rig search listing page by page from `listing` (algo -> records)
+def listing_responder(listing):
+    def respond(method, path, body):
+        parms = json.loads(body)
+        records = listing.get(parms['type'], [])
+        page = records[parms['offset']:parms['offset'] + parms['count']]
+        return 200, {'success': True, 'data': {'count': len(records), 'records': page}}
+    return respond
+
+
+# Full and incremental Scanner refreshes, then top-k queries on the index
+def bench_scanner(n=10000, algos=('sha256', 'scrypt', 'x11')):
+    listing = {algo: synthetic_rigs(n, algo) for algo in algos}
+    server = stub_server(listing_responder(listing))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        scanner = Scanner(mrr, algos)
+        begin = time.perf_counter()
+        scanner.refresh()
+        report("Scanner.refresh %d algos x %d rigs" % (len(algos), n), time.perf_counter() - begin)
+        listing[algos[0]][0]['minhours'] = "1"
+        begin = time.perf_counter()
+        scanner.refresh()
+        report("Scanner.refresh, one rig changed", time.perf_counter() - begin)
+    report("Scanner.top_k(10, hours=24)", timed(lambda: scanner.top_k(algos[0], 10, hours=24), 1000))
+    server.shutdown()
+
+
+# A large /rig/mine body buffered and decoded whole vs streamed record by record,
+# then the same body decoded by the stdlib json and by the fastjson backend
+def bench_stream(n=20000):
+    body = json.dumps({'success': True, 'data': synthetic_rigs(n)}).encode()
+    server = stub_server(lambda method, path, parms: (200, body))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+
+        def buffered():
+            return len(mrr.get("/rig/mine")['data'])
+
+        def streamed():
+            return sum(1 for rig in mrr.iter_my_rigs())
+
+        for name, fn in (("get /rig/mine", buffered), ("iter_my_rigs", streamed)):
+            tracemalloc.start()
+            assert fn() == n
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report("%s, %d rigs" % (name, n), timed(fn, 5))
+            print(f"{'':<40} {peak / 2**20:10.1f} MiB peak")
+    report("json.loads, %.1f MiB" % (len(body) / 2**20), timed(lambda: json.loads(body), 5))
+    report("fastjson.loads (%s)" % fastjson.backend, timed(lambda: fastjson.loads(body), 5))
+    server.shutdown()
+
+
+# Streamed calls retried by the scheduler must hand their connection back.
+# A non-blocking one-connection pool opens a new connection for every leaked
+# 429 response instead of waiting on it forever, so leaks show as extra connections.
+def bench_stream_retry(calls=20, throttled=3):
+    answers = []
+
+    def respond(method, path, body):
+        answers.append(path)
+        if len(answers) % (throttled + 1):
+            return 429, {'success': False, 'data': {'message': 'slow down'}}
+        return 200, {'success': True, 'data': synthetic_rigs(10)}
+
+    server = stub_server(respond)
+    with MRR("key", "secret", pool_size=1) as mrr:
+        mrr.root_uri = server.url
+        mrr.transport = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        mrr.scheduler = Scheduler({'default': (1000, 1000)}, backoff=0.001, retries=throttled)
+        begin = time.perf_counter()
+        finished = [sum(1 for _ in mrr.iter_my_rigs()) for _ in range(calls)]
+        elapsed = time.perf_counter() - begin
+        pools = mrr.transport.poolmanager.pools
+        opened = sum(pools[name].num_connections for name in pools.keys())
+        assert finished == [10] * calls, "streamed retries lost records"
+        assert opened == 1, "streamed retries leaked %d pooled connections" % (opened - 1)
+        report("iter_my_rigs after %d x 429, 1 connection" % throttled, elapsed / calls)
+    server.shutdown()
+
+
+SAMPLE_VALUES = {
+    'ids': "1;2",
+    'int': 1,
+    'float': 1.5,
+    'str': "x",
+    'bool': True,
+    'json': [{'id': 1}],
+    'algo': "sha256",
+}
+
+
+# Send every registry entry to the stub, checking the method and path it produces
+def bench_registry(rounds=20):
+    seen = []
+
+    def respond(method, path, body):
+        seen.append((method, path))
+        return 200, {'success': True, 'data': {}}
+
+    server = stub_server(respond)
+    calls = [(endpoint, {param.name: SAMPLE_VALUES[param.type] for param in endpoints.fields(endpoint)})
+             for endpoint in endpoints.ENDPOINTS]
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        for endpoint, values in calls:
+            del seen[:]
+            endpoints.call(mrr, endpoint, values)
+            path = endpoint.path.format(ids="1;2", rigids="1;2", id=1, algo="SHA256", priority=1)
+            assert seen == [(endpoint.method, path)], (endpoint.name, seen)
+
+        def run_all():
+            for endpoint, values in calls:
+                endpoints.call(mrr, endpoint, values)
+
+        report("every registry entry (%d calls)" % len(calls), timed(run_all, rounds))
+    server.shutdown()
+
+
+# /info/algos payload for `algos` with random suggested prices and rented hash
+def synthetic_algos(algos):
+    return [{
+        'name': algo,
+        'suggested_price': {'amount': "%.10f" % random.uniform(1e-5, 1e-4), 'currency': 'BTC', 'unit': 'th*day'},
+        'stats': {'rented': {'rigs': random.randint(10, 500), 'hash': {'hash': random.uniform(1, 1e4), 'type': 'th'}}},
+    } for algo in algos]
+
+
+# Repricing a 5k rig fleet from scratch vs after a market move on two algos
+def bench_pricing(n=5000, algo_count=20):
+    algos = ["algo%d" % i for i in range(algo_count)]
+    rigs = synthetic_rigs(n)
+    for rig in rigs:
+        rig['type'] = random.choice(algos)
+    payload = synthetic_algos(algos)
+    repricer = Repricer(None)
+    market = market_snapshot(payload, {})
+    begin = time.perf_counter()
+    updates, moved = repricer.updates(rigs, market)
+    report("full reprice, %d rigs (%d updates)" % (n, len(updates)), time.perf_counter() - begin)
+    for algo in moved:
+        repricer.priced[algo] = market[algo]['inputs']
+    for record in payload[:2]:
+        record['suggested_price']['amount'] = "%.10f" % (float(record['suggested_price']['amount']) * 1.1)
+    market = market_snapshot(payload, {})
+    begin = time.perf_counter()
+    updates, moved = repricer.updates(rigs, market)
+    report("incremental, %d algos moved (%d updates)" % (len(moved), len(updates)), time.perf_counter() - begin)
+
+
+# The per-call signing MRR.query used to do, kept for comparison
+def sign_from_scratch(key, secret, endpoint):
+    endpoint = endpoint.split("?")[0]
+    headers = {
+        'Content-Type': 'application/json',
+        'x-api-key': key,
+        'x-api-nonce': str(time.time()),
+    }
+    sign_string = key + headers['x-api-nonce'] + endpoint
+    headers['x-api-sign'] = hmac.new(secret.encode(), sign_string.encode(), hashlib.sha1).hexdigest()
+    return headers
+
+
+# Signed requests per second, from one thread and from a thread pool
+def bench_signing(n=200000, threads=4):
+    key, secret = "k" * 32, "s" * 64
+    signer = Signer(key, secret)
+    candidates = (
+        ("hmac.new per request", lambda: sign_from_scratch(key, secret, "/rig/1;2;3/threads")),
+        ("Signer", lambda: signer.sign(MRR.root_uri, "/rig/1;2;3/threads")),
+    )
+    for name, sign in candidates:
+        per_call = timed(sign, n)
+        print(f"{name + ', 1 thread':<40} {1 / per_call:10.0f} signs/s")
+
+        def chunk(_):
+            for _ in range(n // threads):
+                sign()
+
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(chunk, range(threads)))
+        print(f"{name + ', %d threads' % threads:<40} {n / (time.perf_counter() - begin):10.0f} signs/s")
+
+
+# Handler counting the records a LogSink hands over
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+# Many threads sharing one MRR and a LogSink; every nonce must be unique,
+# every reply must reach the thread that asked for it and every response the sink
+def bench_threads(threads=16, calls=200):
+    nonces = []
+
+    def respond(method, path, body):
+        return 200, {'success': True, 'data': {'path': path}}
+
+    server = stub_server(respond)
+    original = StubHandler.reply
+
+    def reply(handler):
+        nonces.append(handler.headers['x-api-nonce'])
+        original(handler)
+
+    StubHandler.do_GET = reply
+    handler = CountingHandler()
+    sink = LogSink(handler=handler)
+    try:
+        with MRR("key", "secret", pool_size=threads, sink=sink) as mrr:
+            mrr.root_uri = server.url
+
+            def worker(index):
+                for call in range(calls):
+                    path = "/rig/%d" % (index * calls + call)
+                    assert mrr.get(path)['data']['path'] == path
+
+            begin = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(worker, range(threads)))
+            elapsed = time.perf_counter() - begin
+    finally:
+        StubHandler.do_GET = original
+        sink.close()
+        server.shutdown()
+    assert len(nonces) == len(set(nonces)) == threads * calls
+    assert handler.count == threads * calls, "the sink logged %d of %d responses" % (handler.count, threads * calls)
+    print(f"{'shared MRR, %d threads' % threads:<40} {threads * calls / elapsed:10.0f} calls/s")
+
+
+# Cost of the request hooks: none installed vs a Metrics recorder
+def bench_hooks(n=2000):
+    server = stub_server()
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        report("get, no hooks", timed(lambda: mrr.get("/rig/1;2/threads"), n))
+        mrr.hooks.append(Metrics())
+        report("get, Metrics hook", timed(lambda: mrr.get("/rig/1;2/threads"), n))
+    metrics = mrr.hooks[0]
+    report("Metrics.after alone", timed(lambda: metrics.after("GET", "/rig/1;2/threads", 200, 0.01, 0, 10, 0), 100000))
+    server.shutdown()
+
+
+
+# Serve `n` /account/transactions entries start/limit page by page
+def transactions_responder(n):
+    entries = [{'id': id, 'type': 'Rental Payment', 'currency': 'BTC', 'amount': "%.8f" % random.uniform(0, 1e-3),
+                'when': "2023-08-01 00:00:00", 'rig': id % 50, 'rental': id, 'status': 'Cleared'} for id in range(n)]
+
+    def respond(method, path, body):
+        parms = json.loads(body)
+        page = entries[parms['start']:parms['start'] + parms['limit']]
+        return 200, {'success': True, 'data': {'transactions': page, 'total': n}}
+    return respond
+
+
+# Walking a paginated listing page by page vs prefetching the next page
+def bench_paginate(n=5000, page_size=100, latency=0.005):
+    server = stub_server(transactions_responder(n), latency=latency)
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        for prefetch in (False, True):
+            begin = time.perf_counter()
+            assert sum(1 for _ in mrr.iter_transactions(page_size, prefetch)) == n
+            report("iter_transactions, prefetch=%s" % prefetch, (time.perf_counter() - begin) / n)
+    server.shutdown()
+
+
+# Record a representative session against synthetic stubs: plain calls,
+# multi-id batches, a paginated history and rig graphs
+def record_session(path, rigs=500, transactions=2000):
+    graph_record = synthetic_graph(1)
+
+    def respond(method, path, body):
+        if path.startswith("/account/transactions"):
+            return transactions(method, path, body)
+        if path.endswith("/graph"):
+            ids = path.split("/")[-2].split(";")
+            return 200, {'success': True, 'data': [dict(graph_record, rigid=id) for id in ids]}
+        if path.endswith("/threads"):
+            return ids_responder(method, path, body)
+        return 200, {'success': True, 'data': {'path': path}}
+
+    transactions = transactions_responder(transactions)
+    server = stub_server(respond)
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        mrr.transport = Recorder(path, mrr.root_uri, ("key", "secret"))
+        for endpoint in ("/whoami", "/info/servers", "/info/algos", "/account/balance", "/rig/mine"):
+            mrr.get(endpoint)
+        mrr.batch_get("/rig/{ids}/threads", range(rigs))
+        for _ in mrr.iter_transactions():
+            pass
+        mrr.rig_graphs(range(20))
+    server.shutdown()
+
+
+# Replay a recording through the client: throughput sequential and from a
+# thread pool, peak memory, and p50/p95/p99 latency per endpoint
+def bench_replay(path, latency=0, threads=8):
+    exchanges = load(path)
+    calls = [(exchange['method'], exchange['endpoint'], json.loads(exchange['body']) if exchange['body'] else {})
+             for exchange in exchanges]
+    server = replay_server(path, latency)
+    metrics = Metrics()
+    with MRR("key", "secret", pool_size=threads) as mrr:
+        mrr.root_uri = server.url
+        mrr.hooks.append(metrics)
+
+        def send(call):
+            return mrr.query(*call)['status']
+
+        tracemalloc.start()
+        begin = time.perf_counter()
+        statuses = [send(call) for call in calls]
+        elapsed = time.perf_counter() - begin
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert 404 not in statuses
+        print(f"{'replay %d calls, 1 thread' % len(calls):<40} {len(calls) / elapsed:10.0f} calls/s")
+        print(f"{'':<40} {peak / 2**20:10.1f} MiB peak")
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(send, calls))
+        print(f"{'replay %d calls, %d threads' % (len(calls), threads):<40} {len(calls) / (time.perf_counter() - begin):10.0f} calls/s")
+    for row in metrics.stats():
+        name = "%s %s" % (row['method'], row['endpoint'])
+        print(f"{name[:40]:<40} p50 {row['p50_ms']:7.2f}  p95 {row['p95_ms']:7.2f}  p99 {row['p99_ms']:7.2f} ms")
+    server.shutdown()
+
+
+def bench_recorded():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "session.jsonl")
+    record_session(path)
+    bench_replay(path)
+    os.remove(path)
+    os.rmdir(directory)
+
+
+# Feed polls of a large /rig/mine: baseline, unchanged body, then 1% of rigs
+# changed, plus the memory the feed keeps per rig
+def bench_feed(n=20000):
+    rigs = synthetic_rigs(n)
+    server = stub_server(lambda method, path, body: (200, {'success': True, 'data': rigs}))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        report("Feed.poll baseline, %d rigs" % n, timed(lambda: Feed(mrr).poll(), 1))
+        tracemalloc.start()
+        feed = Feed(mrr)
+        feed.poll()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{'':<40} {held / n:10.0f} bytes/rig held")
+        report("Feed.poll, nothing changed", timed(feed.poll, 3))
+        for rig in random.sample(rigs, n // 100):
+            rig['status'] = {'status': 'rented', 'rented': True}
+        begin = time.perf_counter()
+        events = feed.poll()
+        report("Feed.poll, %d events" % len(events), time.perf_counter() - begin)
+    server.shutdown()
+
+
+# Answer /account/pool/test like a full test, failing auth on every third port
+def pool_test_responder(method, path, body):
+    parms = json.loads(body)
+    ok = int(parms['port']) % 3 != 0
+    return 200, {'success': True, 'data': {'result': {
+        'source': parms.get('source'), 'dest': parms['host'], 'error': 'none', 'connection': True, 'sub': True,
+        'auth': ok, 'red': False, 'diffs': True, 'diff': 65536, 'work': ok, 'executiontime': 0.1}}}
+
+
+# Pools x sources tested one at a time vs PoolChecker's bounded fan-out,
+# then the same check answered from the result cache
+def bench_pools(pools=12, sources=('us-central01', 'eu-01', 'ap-01'), latency=0.05, workers=8):
+    server = stub_server(pool_test_responder, latency=latency)
+    saved = [{'id': id, 'name': "pool%d" % id, 'type': 'sha256', 'host': "pool%d.example" % id,
+              'port': 3330 + id, 'user': 'me', 'pass': 'x'} for id in range(pools)]
+    with MRR("key", "secret", pool_size=workers) as mrr:
+        mrr.root_uri = server.url
+        checker = PoolChecker(mrr, workers=1, cooldown=0)
+        begin = time.perf_counter()
+        checker.check(saved, sources, 'full')
+        report("%d tests one at a time" % (pools * len(sources)), time.perf_counter() - begin)
+        checker = PoolChecker(mrr, workers=workers, cooldown=latency)
+        begin = time.perf_counter()
+        checked = checker.check(saved, sources, 'full')
+        report("PoolChecker, %d workers" % workers, time.perf_counter() - begin)
+        assert sum(not ok for row in matrix(checked).values() for ok in row.values()) == len(sources) * (pools // 3)
+        report("PoolChecker, cached", timed(lambda: checker.check(saved, sources, 'full'), 10))
+    server.shutdown()
+
+
+# Cheapest rig set for a hashrate target on a 10k+ rig marketplace: greedy fill
+# vs optimize() against the fractional lower bound, then a full dry-run plan
+def bench_procure(n=20000, target=50000 * 1e12, hours=12):
+    listing = {'sha256': synthetic_rigs(n)}
+    server = stub_server(lambda method, path, body: (
+        (200, {'success': True, 'data': synthetic_algos(['sha256'])}) if path.startswith("/info/algos")
+        else listing_responder(listing)(method, path, body)))
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        procurer = Procurer(mrr, 'sha256')
+        rows = procurer.candidates(hours)
+        greedy = bound = covered = 0.0
+        for row in rows:
+            cost = rental_cost(row['price'], row['hashrate'], hours)
+            if covered < target:
+                bound += cost * min(1, (target - covered) / row['hashrate'])
+                greedy += cost
+                covered += row['hashrate']
+        plan = optimize(rows, target, hours)
+        assert plan.feasible and plan.hashrate >= target
+        report("optimize, %d candidates" % len(rows), timed(lambda: optimize(rows, target, hours), 5))
+        print(f"{'greedy / optimized cost over bound':<40} {greedy / bound - 1:10.4%} {plan.cost / bound - 1:8.4%}")
+        begin = time.perf_counter()
+        report_ = procurer.procure(target, hours, dry_run=True, max_premium=10)
+        report("Procurer dry run (%d rigs)" % len(report_['plans'][0]['rigs']), time.perf_counter() - begin)
+    server.shutdown()
+
+
+# One operation over many accounts: one account after another vs Accounts.each
+def bench_accounts(n=40, latency=0.02):
+    server = stub_server(latency=latency)
+    accounts = Accounts(Account("account%d" % i, "key%d" % i, "secret") for i in range(n))
+    with accounts:
+        for name in accounts.names:
+            accounts.client(name).root_uri = server.url
+        begin = time.perf_counter()
+        for name in accounts.names:
+            accounts.client(name).get("/account/balance")
+        report("%d accounts in sequence" % n, time.perf_counter() - begin)
+        begin = time.perf_counter()
+        assert sum(1 for line in accounts.each(lambda client: client.get("/account/balance")) if 'result' in line) == n
+        report("Accounts.each, 8 workers", time.perf_counter() - begin)
+    begin = time.perf_counter()
+    Accounts(Account("account%d" % i, "key%d" % i, "secret") for i in range(10000))
+    report("registry of 10000 accounts", time.perf_counter() - begin)
+    server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-bench", description="Offline benchmarks of the MRR client")
+    parser.add_argument('--replay', metavar='FILE', help='only replay a recording made with main.py --record')
+    parser.add_argument('--latency', type=float, default=0, help='seconds the replay stub waits per call')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args(argv)
+    if args.replay is not None:
+        bench_replay(args.replay, args.latency, args.threads)
+        return 0
+    bench_session()
+    bench_async()
+    bench_batch()
+    bench_paginate()
+    bench_graph()
+    bench_scanner()
+    bench_stream()
+    bench_stream_retry()
+    bench_feed()
+    bench_registry()
+    bench_pricing()
+    bench_procure()
+    bench_signing()
+    bench_threads()
+    bench_hooks()
+    bench_pools()
+    bench_accounts()
+    bench_recorded()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
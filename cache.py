@@ -0,0 +1,117 @@
+import fnmatch
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Seconds a GET response stays fresh, by endpoint pattern (first match wins).
+# Endpoints not listed here are never cached.
+DEFAULT_TTLS = [
+    ("/info/servers", 3600),
+    ("/info/algos", 300),
+    ("/info/algos/*", 300),
+    # txfee may change every 15 minutes
+    ("/info/currencies", 900),
+    ("/account/currencies", 900),
+]
+
+
+class ResponseCache:
+    def __init__(self, ttls=DEFAULT_TTLS, max_entries=256, path=None):
+        self.ttls = list(ttls)
+        self.max_entries = max_entries
+        # Optional sqlite file so entries survive between runs
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, endpoint TEXT, expires REAL, data TEXT)")
+        return self._db
+
+    def ttl(self, endpoint):
+        path = endpoint.split("?")[0]
+        for pattern, seconds in self.ttls:
+            if fnmatch.fnmatchcase(path, pattern):
+                return seconds
+        return None
+
+    def key(self, endpoint, parms):
+        return endpoint + "|" + repr(sorted(parms.items()))
+
+    # Cached response text for a GET, or None when missing or expired
+    def get(self, endpoint, parms):
+        key = self.key(endpoint, parms)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.db is not None:
+                row = self.db.execute("SELECT endpoint, expires, data FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = self._entries[key] = row
+                    self._evict()
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, endpoint, parms, data):
+        key = self.key(endpoint, parms)
+        entry = (endpoint, time.time() + self.ttl(endpoint), data)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (key,) + entry)
+                self.db.commit()
+
+    # Drop least recently used entries past max_entries
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.db.commit()
+
+    # A write drops every cached entry under the same top-level resource,
+    # e.g. PUT /account/pool invalidates /account/currencies
+    def invalidate(self, endpoint):
+        prefix = "/" + endpoint.split("?")[0].strip("/").split("/")[0]
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[0] == prefix or entry[0].startswith(prefix + "/"):
+                    self._entries.pop(key)
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache WHERE endpoint = ? OR endpoint LIKE ?", (prefix, prefix + "/%"))
+                self.db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache")
+                self.db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+        }
@@ -0,0 +1,392 @@
+import json
+import string
+from collections import namedtuple
+
+# One api call: menu number, cli command words, http method, path template,
+# body/query params and a one-line description
+Endpoint = namedtuple('Endpoint', 'command name method path params help')
+# name as sent to the api, value type, prompt/help text
+Param = namedtuple('Param', 'name type help')
+
+IDS = 'Enter an ID or IDs in this format -> ID1;ID2;ID3 ...'
+ALGO = 'Algo to filter -- see /info/algos'
+HOST = 'Pool host, the part after stratum+tcp://'
+PORT = 'Pool port, the part after the : in most pool host strings'
+USER = 'Your workername'
+PASS = 'Worker Password'
+PRIORITY = 'Enter the priority(0-4)'
+START = 'Start number (for pagination)'
+LIMIT = 'Limit number (for pagination)'
+
+POOL_PARAMS = (
+    Param('host', 'str', HOST),
+    Param('port', 'int', PORT),
+    Param('user', 'str', USER),
+    Param('pass', 'str', PASS),
+    Param('priority', 'int', PRIORITY),
+)
+
+ENDPOINTS = (
+    Endpoint(0, 'whoami', 'GET', '/whoami', (), 'Test connectivity and return information about you'),
+    Endpoint(1, 'info servers', 'GET', '/info/servers', (), 'Get a list of MRR rig servers'),
+    Endpoint(2, 'info algos', 'GET', '/info/algos', (), 'Get all algos and statistics for them'),
+    Endpoint(3, 'info algo', 'GET', '/info/algos/{algo}', (), 'Get statistics for an algo'),
+    Endpoint(4, 'info currencies', 'GET', '/info/currencies', (), 'Get a list of currencies used for payments'),
+    Endpoint(5, 'account info', 'GET', '/account', (), 'Retrieve account information'),
+    Endpoint(6, 'account balance', 'GET', '/account/balance', (), 'Retrieve account balances'),
+    # 7 - PUT /account/balance (payout/withdrawal) is disabled by the api
+    Endpoint(8, 'account transactions', 'GET', '/account/transactions', (
+        Param('start', 'int', START),
+        Param('limit', 'int', LIMIT),
+        Param('algo', 'str', ALGO),
+        Param('type', 'str', 'Type to filter -- one of [credit,payout,referral,deposit,payment,credit/refund,debit/refund,rental fee]'),
+        Param('rig', 'int', 'Filter to specific rig'),
+        Param('rental', 'int', 'Filter to specific rental'),
+        Param('txid', 'str', 'Filter to specific txid'),
+        Param('time_greater_eq', 'int', 'Filter to greater then or equal, as Unix Timestamp integer'),
+        Param('time_less_eq', 'int', 'Filter to less then or equal, as Unix Timestamp integer'),
+    ), 'List/search transaction history'),
+    Endpoint(9, 'profile list', 'GET', '/account/profile', (
+        Param('algo', 'str', ALGO),
+    ), 'List all pool profiles, or list by algo'),
+    Endpoint(10, 'profile create', 'PUT', '/account/profile', (
+        Param('name', 'str', 'Name of the profile'),
+        Param('algo', 'str', ALGO),
+    ), 'Create a pool profile'),
+    Endpoint(11, 'profile get', 'GET', '/account/profile/{id}', (), 'Get a specific pool profile'),
+    Endpoint(12, 'profile add-pool', 'PUT', '/account/profile/{id}', (
+        Param('poolid', 'int', 'Pool ID to add -- see /account/pools'),
+        Param('priority', 'int', PRIORITY),
+    ), 'Add or replace a pool to the profile'),
+    Endpoint(13, 'profile set-pool', 'PUT', '/account/profile/{id}/{priority}', (
+        Param('poolid', 'int', 'Pool ID to add -- see /account/pools'),
+    ), 'Add or replace a pool to a profile at a priority'),
+    Endpoint(14, 'profile delete', 'DELETE', '/account/profile/{id}', (), 'Delete a specific pool profile'),
+    Endpoint(15, 'pool test', 'PUT', '/account/pool/test', (
+        Param('method', 'str', 'Can be one of simple or full'),
+        Param('extramethod', 'str', 'ether_stratum protocol, one of [esm0,esm1,esm2,esm3]; default esm0 (auto detect)'),
+        Param('type', 'str', "The algorithm type name, such as scrypt,sha256,hashimotos,x11. Required for the 'full' test method"),
+        Param('host', 'str', 'Url or host address of the pool. Can include port'),
+        Param('port', 'int', 'Port to connect to the pool host, required if no port is set in the host parameter'),
+        Param('user', 'str', 'User to attempt to authenticate with the pool. Required for the full test method'),
+        Param('pass', 'str', 'Password sent with authentication to the pool. Required for the full test method'),
+        Param('source', 'str', 'Source MRR server to test from, e.g. us-central01, eu-01 -- see /info/servers'),
+    ), 'Test a pool to verify connectivity/functionality with MRR'),
+    Endpoint(16, 'pool list', 'GET', '/account/pool', (), 'List saved pools'),
+    Endpoint(17, 'pool get', 'GET', '/account/pool/{ids}', (), 'Get saved pools'),
+    Endpoint(18, 'pool create', 'PUT', '/account/pool', (
+        Param('type', 'str', 'Pool algo, eg: sha256, scrypt, x11, etc'),
+        Param('name', 'str', 'Name to identify the pool with'),
+        Param('host', 'str', HOST),
+        Param('port', 'int', PORT),
+        Param('user', 'str', USER),
+        Param('pass', 'str', PASS),
+        Param('note', 'str', 'Additional notes to help identify the pool for you'),
+    ), 'Create a saved pool'),
+    Endpoint(19, 'pool update', 'PUT', '/account/pool/{ids}', (
+        Param('name', 'str', 'Name to identify the pool with'),
+        Param('host', 'str', HOST),
+        Param('port', 'int', PORT),
+        Param('user', 'str', USER),
+        Param('pass', 'str', PASS),
+        Param('note', 'str', 'Additional notes to help identify the pool for you'),
+    ), 'Update saved pools'),
+    Endpoint(20, 'pool delete', 'DELETE', '/account/pool/{ids}', (), 'Delete saved pools'),
+    Endpoint(21, 'account currencies', 'GET', '/account/currencies', (), 'Currencies enabled/disabled for your account'),
+    Endpoint(22, 'rig search', 'GET', '/rig', (
+        Param('type', 'str', 'Rig algo, eg: sha256, scrypt, x11, etc'),
+        Param('minhours', 'float', 'Filter by minimum rental hours'),
+        Param('maxhours', 'float', 'Filter by maximum rental hours'),
+        Param('rpi', 'float', 'Filter by minimum RPI score'),
+        Param('count', 'int', 'Number of rigs to return (max 100)'),
+        Param('offset', 'int', 'Offset of the first rig (for pagination)'),
+    ), 'Search for rigs on a specified algo'),
+    Endpoint(23, 'rig mine', 'GET', '/rig/mine', (
+        Param('type', 'str', 'Rig algo, eg: sha256, scrypt, x11, etc'),
+        Param('hashrate', 'bool', 'Include hashrate information'),
+    ), 'List my rigs'),
+    Endpoint(24, 'rig get', 'GET', '/rig/{ids}', (), 'Get 1 or more rigs by ID'),
+    Endpoint(25, 'rig create', 'PUT', '/rig', (
+        Param('name', 'str', 'Name of rig'),
+        Param('server', 'str', 'Server name -- see /info/servers'),
+    ), 'Create a rig'),
+    Endpoint(26, 'rig batch', 'POST', '/rig/batch', (
+        Param('rigs', 'json', "JSON array of rig objects, each with an 'id' and the fields to update"),
+    ), "Update a batch of rigs using a 'rigs' array"),
+    Endpoint(27, 'rig delete', 'DELETE', '/rig/{ids}', (), 'Delete 1 or more rigs by ID'),
+    Endpoint(28, 'rig extend', 'PUT', '/rig/{ids}/extend', (
+        Param('hours', 'float', 'Hours to extend by'),
+        Param('minutes', 'float', 'Minutes to extend by'),
+    ), 'For Rig Owners: Extend a rental to donate time to the renter'),
+    Endpoint(29, 'rig batch-extend', 'POST', '/rig/batch/extend', (
+        Param('rigs', 'json', "JSON array of {'id', 'hours', 'minutes'} objects"),
+    ), 'For Rig Owners: Extend rentals on a list of rigs'),
+    Endpoint(30, 'rig profile', 'PUT', '/rig/{ids}/profile', (
+        Param('profile', 'int', 'Profile ID to apply -- see /account/profile'),
+    ), 'Apply a pool profile to one or more rigs'),
+    Endpoint(31, 'rig pools', 'GET', '/rig/{ids}/pool', (), 'List pools assigned to one or more rigs'),
+    Endpoint(32, 'rig pool-set', 'PUT', '/rig/{ids}/pool', POOL_PARAMS, 'Add or replace a pool on one or more rigs'),
+    Endpoint(33, 'rig pool-delete', 'DELETE', '/rig/{ids}/pool', (
+        Param('priority', 'int', PRIORITY),
+    ), 'Delete a pool on one or more rigs'),
+    Endpoint(34, 'rig port', 'GET', '/rig/{ids}/port', (), 'Get a direct port # to use inplace of 3333'),
+    Endpoint(35, 'rig threads', 'GET', '/rig/{ids}/threads', (), 'Active threads for a rig or list of rigs'),
+    Endpoint(36, 'rig graph', 'GET', '/rig/{ids}/graph', (
+        Param('hours', 'float', 'Hours of history to return'),
+    ), 'Historical hashrate graph information for rigs'),
+    Endpoint(37, 'riggroup list', 'GET', '/riggroup', (), 'Get a list of your rig groups'),
+    Endpoint(38, 'riggroup create', 'PUT', '/riggroup', (
+        Param('name', 'str', 'A name to represent your rig group'),
+    ), 'Create a rig group'),
+    Endpoint(39, 'riggroup get', 'GET', '/riggroup/{id}', (), "Get a rig group's details"),
+    Endpoint(40, 'riggroup update', 'PUT', '/riggroup/{id}', (
+        Param('name', 'str', 'A name to represent your rig group'),
+        Param('enabled', 'int', '1 is enabled, 0 is disabled'),
+        Param('rental_limit', 'int', 'Active rentals allowed on the group before disabling the other rigs'),
+    ), 'Update a rig group'),
+    Endpoint(41, 'riggroup delete', 'DELETE', '/riggroup/{id}', (), 'Delete a rig group'),
+    Endpoint(42, 'riggroup add', 'POST', '/riggroup/{id}/add/{rigids}', (), 'Add one or more rigs to your rig group'),
+    Endpoint(43, 'riggroup remove', 'POST', '/riggroup/{id}/remove/{rigids}', (), 'Remove one or more rigs from your rig group'),
+    Endpoint(44, 'rental list', 'GET', '/rental', (
+        Param('type', 'str', 'one of [owner,renter] -- owner means rentals on your rigs, renter means rentals you purchased'),
+        Param('algo', 'str', ALGO),
+        Param('history', 'bool', 'true = Show completed rentals, false = Active rentals'),
+        Param('rig', 'int', 'Show rentals related to a specific rig ID'),
+        Param('start', 'int', START),
+        Param('limit', 'int', LIMIT),
+        Param('currency', 'str', 'Filter by rentals paid currency, one of (BTC,LTC,ETH,DASH)'),
+    ), 'Lists rentals'),
+    Endpoint(45, 'rental get', 'GET', '/rental/{ids}', (), 'Get information on rentals by rental ID'),
+    Endpoint(46, 'rental create', 'PUT', '/rental', (
+        Param('rig', 'int', 'Rig ID to rent'),
+        Param('length', 'float', 'Length in hours to rent'),
+        Param('profile', 'int', 'The profile ID to apply (see /account/profile)'),
+        Param('currency', 'str', 'Currency to use, one of (BTC,LTC,ETH,DASH)'),
+        Param('rate.type', 'str', 'The hash type of rate. defaults to "mh", possible values: [hash,kh,mh,gh,th]'),
+        Param('rate.price', 'float', "Price per [rate.type] per day to pay -- a filter only, the rig's current price is used as long as it is <= this value"),
+    ), 'Create a new rental'),
+    Endpoint(47, 'rental profile', 'PUT', '/rental/{ids}/profile', (
+        Param('profile', 'int', 'Profile ID to apply -- see /account/profile'),
+    ), 'Apply a pool profile to one or more rentals'),
+    Endpoint(48, 'rental pools', 'GET', '/rental/{ids}/pool', (), 'List pools assigned to one or more rentals'),
+    Endpoint(49, 'rental pool-set', 'PUT', '/rental/{ids}/pool', POOL_PARAMS, 'Add or replace a pool on one or more rentals'),
+    Endpoint(50, 'rental pool-delete', 'DELETE', '/rental/{ids}/pool', (
+        Param('priority', 'int', PRIORITY),
+    ), 'Delete a pool on one or more rentals'),
+    Endpoint(51, 'rental extend', 'PUT', '/rental/{ids}/extend', (
+        Param('length', 'float', 'Length in hours to purchase an extension for'),
+    ), 'Purchase an extension on one more rentals'),
+    Endpoint(52, 'rental graph', 'GET', '/rental/{ids}/graph', (), 'Historical hashrate graph information for rentals'),
+    Endpoint(53, 'rental log', 'GET', '/rental/{ids}/log', (), "'Activity Log' detail messages on one or more of your rentals"),
+    Endpoint(54, 'rental messages', 'GET', '/rental/{ids}/message', (), 'Messages on one or more of your rentals'),
+    Endpoint(55, 'rental message', 'PUT', '/rental/{ids}/message', (
+        Param('message', 'str', 'The message to add to a rental'),
+    ), 'Send a message to one or more of your rentals'),
+    Endpoint(56, 'pricing', 'GET', '/pricing', (), 'List of marketplace pricing rates'),
+)
+
+# Longer menu descriptions, shown under the one-line help
+NOTES = {
+    1: (
+        'Get a list of MRR rig servers. Please note the port and ethereum_port entries are depreciated, port information is dependant on your rig.\n'
+        'Please see /rig/port for that information.'
+    ),
+    4: (
+        'Get a list of currencies currently used for payments that are installed into our system.\n'
+        'The currency may be enabled or disabled, disabled means that no function with that currency should work or attempted to be performed.\n'
+        'Pair with /account/currencies endpoint. Each account has a seperate currency enablement status.\n'
+        'We may add or disable a currency at any time. txfee is the current fee being charged for withdraw, it *may* change every 15 minutes.'
+    ),
+    8: (
+        'List/search transaction history. `id`:always, `type`:always, `currency`:always, `amount`:always; and is negative when a deduction, `when`:always as UTC.\n'
+        "`rental`,`rig`:only when not (`type` = ('Payout' or 'Deposit')).\n"
+        "`txid`:only when `type` = ('Payout' or 'Deposit').\n"
+        "`txfee`,`payout_address`:only when `type` = 'Payout'.\n"
+        "`sent`: only when `sent`='no' and `type` = 'Payout'.\n"
+        "`status`:always and is 'Cleared' or 'Pending',`pending_seconds`:always and is non 0 when `status` = 'Pending'.\n"
+        "`info`: only when not (`type` = ('Payout' or 'Deposit')) and there is an extra comment/info for the transaction."
+    ),
+    15: (
+        'Test a pool to verify connectivity/functionality with MRR. This endpoint is now active.\n'
+        'Simple or full test; Simple verifies connectivity to the host and port only.\n'
+        'Full test takes in user, password and the algorithm type which is then used to pick the stratum type to check against the pool.\n'
+        'extramethod is used to specify an ethhash/ether_stratum protocol version, default is auto detection.\n'
+        'Test source can be specified as one of our available rig servers. Test may choose to fall back to simple test if there is a configuration failure.\n'
+        'error array is used for internal error, error string in result may contain a description of any problem encountered.\n'
+        "Output: simple test returns 'source' test server; the 'dest' / destination pool; an 'error' code (usually 'none'); 'connection' is true if we were able to succesfully connect to the pool; 'executiontime' records how long the test took.\n"
+        'A test call can take up to 10-20 seconds when all failures are present.Output: full test contains all the same as simple plus;\n'
+        "'protocol' the chosen test protocol; if 'sub' is present then the protocol contains a mining subscription - true if sent valid response;\n"
+        "'auth' is true if the authorization response was accepted by the pool; if 'red' is present then the protocol may send a 'client.reconnect', if it is true this means the pool is incompatible with MRR;\n"
+        "'diffs' is true when pool has set mining difficulty, 'diff' is the difficulty it sent; 'work' is true when the pool has sent a valid work broadcast;\n"
+        "'ssl' is true if the pool tested as being ssl/tls compatible and the test used ssl/tls to connect; if 'xnonce' is present and true it means the pool accepts mining.extranonce.\n"
+        'A valid and complete test in which the pool is compatible with MRR: connection: true, sub: true, auth: true, red: false, diffs: true, diff: >0, work: true.\n'
+        'Please do not abuse the test or hammer pools as they may block us and our miners!'
+    ),
+    21: (
+        'Get a list of currencies currently used for payments that are enabled/disabled for your account.\n'
+        'If a currency is disabled for your account, you may not have access to some functions or data using that currency.\n'
+        'We use this to enable or disable a currency on our platform, we may add or disable a currency at any time.'
+    ),
+    28: (
+        'For Rig Owners: Extend a rental to donate time to the renter -- Assuming an active rental is in progress.\n'
+        'Extension length must be at least 1 minute (0.0166666666666666 hours).\n'
+        "Inputs 'hours' and 'minutes' are additive to eachother, for example 0.23343 hours and 2 minutes, are added to the Extension length.\n"
+        'Must have at least one of the arguments.'
+    ),
+    29: (
+        'Batch endpoint - For Rig Owners: Extend a rental using a list of rigs in order to donate time to the renter -- Assuming an active rental is in progress.\n'
+        "Extension length must be at least 1 minute (0.0166666666666666 hours). Inputs 'hours' and 'minutes' are additive to eachother, for example 0.23343 hours and 2 minutes, are added to the Extension length.\n"
+        'Must have at least one of the arguments and are specified individually for each rig.'
+    ),
+    35: (
+        'Obtain a list of currently active threads for a rig or list of rigs. Note that information output can change depending on level of access, public, renter, or owner.\n'
+        'If you are the renter of the rig, access changes to renter and you can see more information than public view for the rig.\n'
+        'If you are the owner of the rig you can see all the information for your rig.'
+    ),
+    36: (
+        'Obtain a rigs graph information. Historical hashrate bars, average, rejected rate, rental periods, offline periods and pool offline periods.\n'
+        '"bars","average","rejected" are all strings that contain [] delimited array, consisting of a unix timestamp in miliseconds followed by the numerical hashrate value.\n'
+        '"rentals","offline","pooloffline" are comma delimited array, contain unix timestamps in miliseconds for start and end pair of each period seperated by : (colon).\n'
+        'For current rigs the lastest timestamp will be the latest minute period processed by our system.'
+    ),
+    44: (
+        'Lists rentals\n'
+        'Note: Average hashrate information is removed over time. Historical rentals may show a "0%"  average hashrate even if they hashed properly.\n'
+        'We prune this data to minimize storage space.'
+    ),
+    52: (
+        'Obtain a rental graph information. Historical hashrate bars, average, rejected rate, rental periods, offline periods and pool offline periods.\n'
+        '"bars","average","rejected" are all strings that contain [] delimited array, consisting of a unix timestamp in miliseconds followed by the numerical hashrate value.\n'
+        '"offline","pooloffline" are comma delimited array, contain unix timestamps in miliseconds for start and end pair of each period seperated by : (colon).\n'
+        '"rentals" is always none. time_start and time_end contain textual display of start and end time of the rental.\n'
+        'Please note that for long rentals it can take some time to generate a graph, and even longer if you select more then one of them so please be sparing in the use of this.'
+    ),
+    53: (
+        "Obtain 'Activity Log' detail messages on one or more of your rentals.\n"
+        'Your view will depend on if you are the renter, or the rig owner.\n'
+        'Return data is an array if more then one rental is requested, if single rental then the log is not in an array.'
+    ),
+}
+
+# Path placeholders: value type and prompt
+FIELDS = {
+    'ids': Param('ids', 'ids', IDS),
+    'rigids': Param('rigids', 'ids', 'Enter a rig ID or rig IDs in this format -> ID1;ID2;ID3 ...'),
+    'id': Param('id', 'int', 'Enter the ID:'),
+    'algo': Param('algo', 'algo', 'Enter the name of the algo'),
+    'priority': Param('priority', 'int', PRIORITY),
+}
+
+# Menu heading for each command group
+GROUPS = {
+    'whoami': 'Information',
+    'info': 'Information',
+    'account': 'Account',
+    'profile': 'Account',
+    'pool': 'Account',
+    'rig': 'Rig',
+    'riggroup': 'Rig Groups',
+    'rental': 'Rental',
+    'pricing': 'Pricing',
+}
+
+# Dispatch tables: cli command words and menu numbers
+BY_NAME = {endpoint.name: endpoint for endpoint in ENDPOINTS}
+BY_COMMAND = {endpoint.command: endpoint for endpoint in ENDPOINTS}
+
+# Placeholders that take ID1;ID2;ID3 lists
+ID_LISTS = ('ids', 'rigids')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError("not a boolean: %r" % value)
+
+
+def parse_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+# "1;2;3", "1 2 3" or an iterable of ids -> list of id strings
+def parse_ids(value):
+    if isinstance(value, (str, int)):
+        value = [value]
+    ids = [id for item in value for id in str(item).replace(" ", ";").split(";") if id]
+    if not ids or not all(id.isdigit() for id in ids):
+        raise ValueError("ids must be numbers separated by ';': %r" % (value,))
+    return ids
+
+
+TYPES = {
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': parse_bool,
+    'json': parse_json,
+    'ids': parse_ids,
+    'algo': lambda value: str(value).strip().upper(),
+}
+
+
+# Names of the {placeholders} in a path template, in order
+def placeholders(path):
+    return [field for _, field, _, _ in string.Formatter().parse(path) if field]
+
+
+# Path placeholders then params of an endpoint, each as a Param
+def fields(endpoint):
+    return [FIELDS[field] for field in placeholders(endpoint.path)] + list(endpoint.params)
+
+
+# Check and coerce call values against the registry, returning (path values, parms).
+# Missing path values, unknown names and badly typed values raise ValueError;
+# params left as None or "" are not sent.
+def validate(endpoint, values):
+    known = {param.name: param for param in endpoint.params}
+    unknown = set(values) - set(known) - set(placeholders(endpoint.path))
+    if unknown:
+        raise ValueError("%s: unknown parameters %s" % (endpoint.name, ", ".join(sorted(unknown))))
+    path = {}
+    for field in placeholders(endpoint.path):
+        if values.get(field) in (None, ""):
+            raise ValueError("%s: missing %s" % (endpoint.name, field))
+        try:
+            path[field] = TYPES[FIELDS[field].type](values[field])
+        except (TypeError, ValueError) as error:
+            raise ValueError("%s: bad %s: %s" % (endpoint.name, field, error))
+    parms = {}
+    for name, value in values.items():
+        if name in known and value not in (None, ""):
+            try:
+                parms[name] = TYPES[known[name].type](value)
+            except (TypeError, ValueError) as error:
+                raise ValueError("%s: bad %s: %s" % (endpoint.name, name, error))
+    return path, parms
+
+
+# Send one endpoint call. `values` maps path placeholders and params to values;
+# id lists may be given as "1;2;3" or as a list. Multi-id GETs are batched.
+def call(mrr, endpoint, values):
+    path, parms = validate(endpoint, values)
+    if endpoint.method == "GET" and list(path) == ['ids']:
+        return mrr.batch_get(endpoint.path, path['ids'], parms)
+    path = {field: ";".join(value) if field in ID_LISTS else value for field, value in path.items()}
+    return getattr(mrr, endpoint.method.lower())(endpoint.path.format(**path), parms)
+
+
+# The numbered menu text, built on first use
+def menu_text():
+    lines = []
+    for endpoint in ENDPOINTS:
+        heading = "%d - %s - " % (endpoint.command, GROUPS[endpoint.name.split()[0]])
+        text = NOTES.get(endpoint.command, endpoint.help).split("\n")
+        lines.append("    " + heading + text[0])
+        lines.extend("        " + line for line in text[1:])
+        lines.append("")
+    return "\n" + "\n".join(lines)
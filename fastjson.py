@@ -0,0 +1,64 @@
+import codecs
+import json
+import re
+
+# Response bodies are decoded with orjson when it is installed, else the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+    backend = "orjson"
+else:
+    loads = json.loads
+    backend = "json"
+
+_decoder = json.JSONDecoder()
+_separator = re.compile(r'[\s,]*')
+
+
+# Yield the elements of the `field` array from a stream of byte chunks as soon
+# as each one is complete, e.g. field='records' for a /rig search response.
+# The array must be the first value in the document keyed `field`; ValueError
+# is raised when no such array arrives or the response ends inside it.
+def stream_array(chunks, field):
+    chunks = iter(chunks)
+    text = codecs.getincrementaldecoder('utf-8')()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(field))
+
+    buffer = ""
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        found = start.search(buffer)
+        if found:
+            buffer = buffer[found.end():]
+            break
+    else:
+        raise ValueError(buffer[:500] or "empty response")
+
+    pos = 0
+    while True:
+        pos = _separator.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            record, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            record, end = None, None
+        # A value reaching the end of the buffer may continue in the next chunk
+        if end is None or end >= len(buffer):
+            chunk = next(chunks, None)
+            if chunk is not None:
+                buffer = buffer[pos:] + text.decode(chunk)
+                pos = 0
+                continue
+            if end is None:
+                raise ValueError("response ended inside the %r array" % field)
+        yield record
+        pos = end
+        # Drop what has been consumed so the buffer stays around one chunk long
+        if pos > 65536:
+            buffer = buffer[pos:]
+            pos = 0
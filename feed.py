@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from fastjson import loads
+from main import MRR, MRRError, key, secret
+from scanner import AVAILABLE, OFFLINE, RENTED, rig_measured_hashrate, rig_price, rig_status
+
+logger = logging.getLogger("mrr.feed")
+
+# One change to one rig. kind is 'rented', 'freed', 'offline', 'online',
+# 'price', 'hashrate', 'added' or 'removed'; old and new are the status codes,
+# prices (per TH/day) or measured hashrates (H/s) involved, record the rig as last seen.
+Event = namedtuple('Event', 'kind rig old new record')
+
+# Event kind for a status transition (old, new)
+TRANSITIONS = {
+    (AVAILABLE, RENTED): 'rented',
+    (OFFLINE, RENTED): 'rented',
+    (RENTED, AVAILABLE): 'freed',
+    (AVAILABLE, OFFLINE): 'offline',
+    (RENTED, OFFLINE): 'offline',
+    (OFFLINE, AVAILABLE): 'online',
+}
+
+
+def digest(record):
+    return hashlib.blake2b(json.dumps(record, sort_keys=True).encode(), digest_size=8).digest()
+
+
+class RigState:
+    # What the feed remembers per rig between polls; the record itself is not kept
+    __slots__ = ('status', 'price', 'hashrate', 'digest')
+
+    def __init__(self, status, price, hashrate, digest):
+        self.status = status
+        self.price = price
+        self.hashrate = hashrate
+        self.digest = digest
+
+
+class Feed:
+    # Polls /rig/mine, or /rig/{ids} in chunks when `ids` is given, and turns
+    # what changed since the last poll into Events. The first poll only takes
+    # a baseline. Hashrate events follow the rigs' measured average over
+    # `hashrate_window` (see scanner.rig_measured_hashrate); changes smaller
+    # than `hashrate_change` (relative) are ignored.
+    def __init__(self, mrr, ids=None, interval=30, currency='BTC', hashrate_change=0.05, workers=4, callback=None,
+                 hashrate_window='last_5min'):
+        self.mrr = mrr
+        self.ids = None if ids is None else [str(id) for id in ids]
+        self.interval = interval
+        self.currency = currency
+        self.hashrate_change = hashrate_change
+        self.hashrate_window = hashrate_window
+        self.workers = workers
+        # Optional callable(event) given every event as poll() finds it
+        self.callback = callback
+        self.rigs = {}
+        # endpoint -> [etag, body digest, rig ids in the body]
+        self._pages = {}
+        self._started = False
+
+    def endpoints(self):
+        if self.ids is None:
+            return ["/rig/mine"]
+        return ["/rig/%s" % ";".join(chunk) for chunk in self.mrr.chunk_ids(self.ids)]
+
+    # Returns (records, ids) for a changed endpoint, or (None, ids) when the
+    # server answered 304 or sent the same body as last time
+    def _fetch(self, endpoint):
+        page = self._pages.get(endpoint)
+        headers = {'If-None-Match': page[0]} if page is not None and page[0] else None
+        # Only /rig/mine reports measured hashrates, and only when asked to
+        parms = {'hashrate': True} if endpoint == "/rig/mine" else {}
+        response = self.mrr.query("GET", endpoint, parms, headers=headers)
+        if response['status'] == 304:
+            return None, page[2]
+        if response['status'] != 200:
+            raise MRRError(response)
+        body_digest = hashlib.blake2b(response['data'].encode(), digest_size=16).digest()
+        if page is not None and page[1] == body_digest:
+            return None, page[2]
+        body = loads(response['data'])
+        if not body.get('success'):
+            raise MRRError(body)
+        records = body['data']
+        records = records if isinstance(records, list) else [records]
+        ids = tuple(str(record['id']) for record in records)
+        self._pages[endpoint] = [response['header'].get('ETag'), body_digest, ids]
+        return records, ids
+
+    def _compare(self, record, events):
+        id = str(record['id'])
+        record_digest = digest(record)
+        state = self.rigs.get(id)
+        if state is not None and state.digest == record_digest:
+            return
+        status, price, hashrate = rig_status(record), rig_price(record, self.currency), rig_measured_hashrate(record, self.hashrate_window)
+        if state is None:
+            self.rigs[id] = RigState(status, price, hashrate, record_digest)
+            if self._started:
+                events.append(Event('added', id, None, status, record))
+            return
+        if status != state.status and (state.status, status) in TRANSITIONS:
+            events.append(Event(TRANSITIONS[state.status, status], id, state.status, status, record))
+        if price != state.price:
+            events.append(Event('price', id, state.price, price, record))
+        if abs(hashrate - state.hashrate) > self.hashrate_change * max(state.hashrate, 1):
+            events.append(Event('hashrate', id, state.hashrate, hashrate, record))
+            state.hashrate = hashrate
+        state.status, state.price, state.digest = status, price, record_digest
+
+    # One pass over every endpoint; returns the events found, in endpoint order
+    def poll(self):
+        endpoints = self.endpoints()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(endpoints)))) as pool:
+            fetched = list(pool.map(self._fetch, endpoints))
+        events = []
+        seen = set()
+        for records, ids in fetched:
+            seen.update(ids)
+            for record in records or ():
+                self._compare(record, events)
+        for id in set(self.rigs) - seen:
+            del self.rigs[id]
+            events.append(Event('removed', id, None, None, None))
+        self._started = True
+        if self.callback is not None:
+            for event in events:
+                self.callback(event)
+        return events
+
+    def run(self, cycles=None):
+        count = 0
+        while cycles is None or count < cycles:
+            began = time.monotonic()
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("feed poll failed")
+            count += 1
+            if cycles is None or count < cycles:
+                time.sleep(max(0, self.interval - (time.monotonic() - began)))
+
+    # `async for event in feed:` polls every interval seconds on a worker thread
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            began = loop.time()
+            for event in await loop.run_in_executor(None, self.poll):
+                yield event
+            await asyncio.sleep(max(0, self.interval - (loop.time() - began)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-feed", description="Print rig status, price and hashrate changes as json lines")
+    parser.add_argument('ids', nargs='*', help='rig ids to watch (default: every rig in /rig/mine)')
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--interval', type=float, default=30, help='seconds between polls')
+    parser.add_argument('--currency', default='BTC')
+    parser.add_argument('--hashrate-change', type=float, default=0.05, help='relative hashrate change worth an event')
+    parser.add_argument('--hashrate-window', choices=('last_5min', 'last_15min', 'last_30min'), default='last_5min',
+                        help='measured average hashrate events follow')
+    parser.add_argument('--cycles', type=int, help='stop after this many polls')
+    args = parser.parse_args(argv)
+
+    def show(event):
+        print(json.dumps({'kind': event.kind, 'rig': event.rig, 'old': event.old, 'new': event.new}), flush=True)
+
+    ids = [id for value in args.ids for id in value.split(";") if id] or None
+    with MRR(args.key, args.secret) as client:
+        Feed(client, ids, args.interval, args.currency, args.hashrate_change, callback=show,
+             hashrate_window=args.hashrate_window).run(args.cycles)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
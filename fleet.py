@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+
+from main import MRR, MRRError, key, secret
+from scanner import RENTED, rig_status
+
+# One planned api call and the rigs it covers
+Request = namedtuple('Request', 'method endpoint parms rigs')
+
+# Rig fields sent through POST /rig/batch
+RIG_FIELDS = ('name', 'status', 'server', 'price', 'minhours', 'maxhours', 'hash', 'ndevices', 'region', 'description')
+POOL_FIELDS = ('host', 'port', 'user', 'pass')
+# Fields of an "extend" spec entry sent through POST /rig/batch/extend
+EXTEND_FIELDS = ('hours', 'minutes')
+# Rigs per /rig/batch body
+BATCH_SIZE = 100
+
+
+def _same(desired, current):
+    if isinstance(desired, (int, float)) and not isinstance(desired, bool):
+        try:
+            return float(current) == float(desired)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(desired, bool):
+        return current in (desired, int(desired), str(desired).lower(), str(int(desired)))
+    return str(desired).lower() == str(current).lower()
+
+
+# The parts of `desired` that differ from `current`, or None when nothing does.
+# Nested dicts (price) are compared key by key, case-insensitively.
+def diff_fields(desired, current):
+    if not isinstance(desired, dict):
+        return None if _same(desired, current) else desired
+    current = current if isinstance(current, dict) else {}
+    lowered = {str(name).lower(): value for name, value in current.items()}
+    changed = {}
+    for name, value in desired.items():
+        delta = diff_fields(value, lowered.get(str(name).lower()))
+        if delta is not None:
+            changed[name] = delta
+    return changed or None
+
+
+# /rig/batch fields a /rig/mine record keeps somewhere else: status under
+# status.status, and the advertised hash under hashrate.advertised
+def _status(rig):
+    status = rig.get('status')
+    return status.get('status') if isinstance(status, dict) else status
+
+
+CURRENT_FIELDS = {
+    'status': _status,
+    'hash': lambda rig: (rig.get('hashrate') or {}).get('advertised'),
+}
+
+
+# A /rig/mine record with every RIG_FIELDS value where diff_fields looks for it
+def current_fields(rig):
+    return dict(rig, **{name: read(rig) for name, read in CURRENT_FIELDS.items()})
+
+
+def pool_key(pool):
+    return tuple(str(pool.get(field, '')).lower() for field in POOL_FIELDS)
+
+
+# /rig/batch/extend entry for a spec "extend" value: hours, or {"hours": h, "minutes": m}
+def extend_entry(id, extend):
+    if not isinstance(extend, dict):
+        extend = {'hours': extend}
+    entry = {field: extend[field] for field in EXTEND_FIELDS if extend.get(field)}
+    return dict(entry, id=int(id)) if entry else None
+
+
+# Saved pools by priority from a /rig/{ids}/pool or /account/profile record
+def pools_by_priority(pools):
+    return {int(pool.get('priority', index)): pool for index, pool in enumerate(pools or [])}
+
+
+class Fleet:
+    def __init__(self, mrr):
+        self.mrr = mrr
+
+    # Current rigs (bulk /rig/mine), their pools (batched /rig/{ids}/pool),
+    # rig group members and any profiles the spec refers to
+    def current(self, spec):
+        mine = self.mrr.get("/rig/mine")
+        if not mine.get('success'):
+            raise MRRError(mine)
+        rigs = {str(rig['id']): rig for rig in mine['data']}
+        wanted = self.desired(spec, rigs)
+        pools = {}
+        if any('pools' in rig or 'profile' in rig for rig in wanted.values()):
+            result = self.mrr.batch_get("/rig/{ids}/pool", wanted)
+            if not result['success']:
+                raise MRRError(result['errors'])
+            pools = {id: pools_by_priority(record.get('pools')) for id, record in result['data'].items()}
+        groups = {}
+        if any('group' in rig for rig in wanted.values()):
+            listing = self.mrr.get("/riggroup")
+            if not listing.get('success'):
+                raise MRRError(listing)
+            for group in listing.get('data') or []:
+                for member in group.get('members') or group.get('rigs') or []:
+                    groups[str(member)] = str(group['id'])
+        profiles = {}
+        for profile in {str(rig['profile']) for rig in wanted.values() if 'profile' in rig}:
+            record = self.mrr.get("/account/profile/" + profile)
+            if not record.get('success'):
+                raise MRRError(record)
+            profiles[profile] = pools_by_priority(record['data'].get('pools'))
+        return rigs, wanted, pools, groups, profiles
+
+    # Spec {"defaults": {...}, "rigs": {id: {...}}, "all": bool} -> desired state per rig id
+    def desired(self, spec, rigs):
+        defaults = spec.get('defaults', {})
+        ids = list(rigs) if spec.get('all') else []
+        ids += [str(id) for id in spec.get('rigs', {}) if str(id) not in ids]
+        overrides = {str(id): state for id, state in spec.get('rigs', {}).items()}
+        return {id: dict(defaults, **overrides.get(id, {})) for id in ids if id in rigs}
+
+    # The fewest requests that move the fleet to `spec`, plus the count a
+    # one-call-per-rig-per-change approach would have needed
+    def plan(self, spec):
+        rigs, wanted, pools, groups, profiles = self.current(spec)
+        updates = []
+        extends = []
+        by_pool = {}
+        by_profile = {}
+        by_group = {}
+        naive = 0
+        for id, state in wanted.items():
+            fields = {name: state[name] for name in RIG_FIELDS if name in state}
+            changed = diff_fields(fields, current_fields(rigs[id])) if fields else None
+            # A hash figure means nothing without its unit, so it is sent whole
+            if changed and 'hash' in changed:
+                changed['hash'] = fields['hash']
+            if changed:
+                updates.append(dict(changed, id=int(id)))
+                naive += 1
+            current_pools = pools.get(id, {})
+            if 'profile' in state:
+                target = profiles.get(str(state['profile']), {})
+                if {p: pool_key(pool) for p, pool in target.items()} != {p: pool_key(pool) for p, pool in current_pools.items()}:
+                    by_profile.setdefault(str(state['profile']), []).append(id)
+                    naive += 1
+            for priority, pool in pools_by_priority(state.get('pools')).items():
+                current = current_pools.get(priority)
+                if current is None or pool_key(current) != pool_key(pool):
+                    parms = dict({field: pool[field] for field in POOL_FIELDS if field in pool}, priority=priority)
+                    by_pool.setdefault(json.dumps(parms, sort_keys=True), []).append(id)
+                    naive += 1
+            if 'group' in state and groups.get(id) != str(state['group']):
+                by_group.setdefault(str(state['group']), []).append(id)
+                naive += 1
+            # Extending is an action rather than a state: every plan with "extend"
+            # donates the time again, to rigs with a rental in progress
+            entry = extend_entry(id, state['extend']) if 'extend' in state else None
+            if entry and rig_status(rigs[id]) == RENTED:
+                extends.append(entry)
+                naive += 1
+
+        requests = []
+        for start in range(0, len(updates), BATCH_SIZE):
+            chunk = updates[start:start + BATCH_SIZE]
+            requests.append(Request("POST", "/rig/batch", {'rigs': chunk}, [str(rig['id']) for rig in chunk]))
+        for start in range(0, len(extends), BATCH_SIZE):
+            chunk = extends[start:start + BATCH_SIZE]
+            requests.append(Request("POST", "/rig/batch/extend", {'rigs': chunk}, [str(rig['id']) for rig in chunk]))
+        for profile, ids in by_profile.items():
+            for chunk in self.mrr.chunk_ids(ids):
+                requests.append(Request("PUT", "/rig/%s/profile" % ";".join(chunk), {'profile': int(profile)}, chunk))
+        for parms, ids in by_pool.items():
+            for chunk in self.mrr.chunk_ids(ids):
+                requests.append(Request("PUT", "/rig/%s/pool" % ";".join(chunk), json.loads(parms), chunk))
+        for group, ids in by_group.items():
+            for chunk in self.mrr.chunk_ids(ids):
+                requests.append(Request("POST", "/riggroup/%s/add/%s" % (group, ";".join(chunk)), {}, chunk))
+        return requests, naive
+
+    def apply(self, spec, dry_run=False):
+        requests, naive = self.plan(spec)
+        results = []
+        if not dry_run:
+            for request in requests:
+                results.append(self.mrr.parse_return(self.mrr.query(request.method, request.endpoint, request.parms)))
+        return {
+            'requests': [request._asdict() for request in requests],
+            'results': results,
+            'sent': 0 if dry_run else len(requests),
+            'naive_requests': naive,
+            'saved': naive - len(requests),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-fleet", description="Apply a desired-state spec to your rigs with batched requests")
+    parser.add_argument('spec', help='json file: {"defaults": {...}, "rigs": {"id": {...}}, "all": false}; '
+                                     'a rig state may hold "extend": hours or {"hours": h, "minutes": m}')
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--dry-run', action='store_true', help='print the planned requests without sending them')
+    args = parser.parse_args(argv)
+    with open(args.spec) as spec:
+        spec = json.load(spec)
+    with MRR(args.key, args.secret) as client:
+        report = Fleet(client).apply(spec, args.dry_run)
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
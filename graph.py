@@ -0,0 +1,88 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from fastjson import loads
+
+# Columns are array.array('d'): millisecond timestamps are exact in a double
+Series = namedtuple('Series', 'timestamps values')
+Intervals = namedtuple('Intervals', 'starts ends')
+Graph = namedtuple('Graph', 'bars average rejected rentals offline pooloffline')
+
+SERIES_FIELDS = ('bars', 'average', 'rejected')
+INTERVAL_FIELDS = ('rentals', 'offline', 'pooloffline')
+
+
+# Comma separated numbers -> one flat column, parsed by the json decoder
+def _flat(text):
+    if not text:
+        return array('d')
+    return array('d', loads('[' + text + ']'))
+
+
+# "[ms,hashrate],[ms,hashrate],..." -> Series of two columns
+def parse_series(text):
+    flat = _flat(text.replace('[', '').replace(']', '') if text else text)
+    return Series(flat[0::2], flat[1::2])
+
+
+# "start:end,start:end,..." (ms) -> Intervals of two columns
+def parse_intervals(text):
+    flat = _flat(text.replace(':', ',') if text else text)
+    return Intervals(flat[0::2], flat[1::2])
+
+
+# Parse one /rig/{ids}/graph or /rental/{ids}/graph record (or its chartdata)
+def parse_graph(record):
+    chart = record.get('chartdata', record)
+    series = [parse_series(chart.get(field)) for field in SERIES_FIELDS]
+    intervals = [parse_intervals(chart.get(field)) for field in INTERVAL_FIELDS]
+    return Graph(*series, *intervals)
+
+
+# Index range of the samples falling in [start, end]
+def _window(series, start, end):
+    lo = 0 if start is None else bisect_left(series.timestamps, start)
+    hi = len(series.timestamps) if end is None else bisect_right(series.timestamps, end)
+    return lo, hi
+
+
+def average_hashrate(series, start=None, end=None):
+    lo, hi = _window(series, start, end)
+    if hi <= lo:
+        return 0.0
+    return sum(series.values[lo:hi]) / (hi - lo)
+
+
+# Rejected hashrate as a fraction of the reported hashrate over the window
+def rejected_ratio(graph, start=None, end=None):
+    lo, hi = _window(graph.bars, start, end)
+    accepted = sum(graph.bars.values[lo:hi])
+    lo, hi = _window(graph.rejected, start, end)
+    rejected = sum(graph.rejected.values[lo:hi])
+    return rejected / accepted if accepted else 0.0
+
+
+# Fraction of [start, end] not covered by offline or pool-offline periods.
+# The window defaults to the span of the hashrate bars.
+def uptime(graph, start=None, end=None):
+    timestamps = graph.bars.timestamps
+    if start is None:
+        start = timestamps[0] if timestamps else 0
+    if end is None:
+        end = timestamps[-1] if timestamps else 0
+    if end <= start:
+        return 1.0
+    periods = sorted(
+        (max(s, start), min(e, end))
+        for intervals in (graph.offline, graph.pooloffline)
+        for s, e in zip(intervals.starts, intervals.ends)
+        if e > start and s < end
+    )
+    down = 0.0
+    cursor = start
+    for s, e in periods:
+        if e > cursor:
+            down += e - max(s, cursor)
+            cursor = e
+    return 1.0 - down / (end - start)
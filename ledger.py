@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from main import MRR, key, secret
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    type TEXT,
+    currency TEXT,
+    amount REAL,
+    "when" TEXT,
+    ts INTEGER,
+    rig INTEGER,
+    rental INTEGER,
+    txid TEXT,
+    txfee REAL,
+    status TEXT,
+    pending_seconds INTEGER,
+    info TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_ts ON transactions (ts);
+CREATE INDEX IF NOT EXISTS transactions_rig ON transactions (rig);
+CREATE INDEX IF NOT EXISTS transactions_rental ON transactions (rental);
+CREATE INDEX IF NOT EXISTS transactions_currency ON transactions (currency);
+CREATE INDEX IF NOT EXISTS transactions_status ON transactions (status);
+"""
+
+COLUMNS = ('id', 'type', 'currency', 'amount', 'when', 'ts', 'rig', 'rental', 'txid', 'txfee',
+           'status', 'pending_seconds', 'info', 'raw')
+
+# Grouping expressions allowed in totals()
+GROUPINGS = {
+    'rig': "rig",
+    'rental': "rental",
+    'currency': "currency",
+    'type': "type",
+    'day': "date(ts, 'unixepoch')",
+}
+
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# "2019-01-29 20:22:51" (UTC) -> unix seconds
+def unix_time(when):
+    try:
+        return int(datetime.strptime(str(when), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        return None
+
+
+class Ledger:
+    def __init__(self, path="mrr_ledger.sqlite"):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def store(self, transactions):
+        rows = []
+        for tx in transactions:
+            rows.append((
+                int(tx['id']), tx.get('type'), tx.get('currency'), _number(tx.get('amount')),
+                tx.get('when'), unix_time(tx.get('when')), _number(tx.get('rig'), int), _number(tx.get('rental'), int),
+                tx.get('txid'), _number(tx.get('txfee')), tx.get('status'), _number(tx.get('pending_seconds'), int),
+                tx.get('info'), json.dumps(tx),
+            ))
+        self.db.executemany("INSERT OR REPLACE INTO transactions VALUES (%s)" % ", ".join("?" * len(COLUMNS)), rows)
+        self.db.commit()
+        return len(rows)
+
+    # Where the next sync starts: the oldest still-pending entry, else the newest entry
+    def sync_from(self, overlap=3600):
+        pending, newest = self.db.execute(
+            "SELECT MIN(CASE WHEN status = 'Pending' THEN ts END), MAX(ts) FROM transactions").fetchone()
+        start = pending if pending is not None else newest
+        return None if start is None else start - overlap
+
+    # Pull only transactions at or after sync_from() and upsert them, so pending
+    # entries are revisited until they clear. The first sync pulls everything.
+    def sync(self, mrr, page_size=100, **filters):
+        start = self.sync_from()
+        if start is not None:
+            filters['time_greater_eq'] = start
+        batch = []
+        stored = 0
+        for tx in mrr.iter_transactions(page_size=page_size, prefetch=False, **filters):
+            batch.append(tx)
+            if len(batch) == page_size:
+                stored += self.store(batch)
+                batch = []
+        return stored + self.store(batch)
+
+    # Sum, count and pending count of amounts grouped by rig, rental, currency, type or day
+    def totals(self, by='currency', since=None, until=None):
+        group = GROUPINGS[by]
+        where = []
+        args = []
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts <= ?")
+            args.append(until)
+        keys = group if by == 'currency' else group + ", currency"
+        sql = ("SELECT %s, SUM(amount), COUNT(*), SUM(status = 'Pending') FROM transactions %s GROUP BY %s ORDER BY %s"
+               % (keys, "WHERE " + " AND ".join(where) if where else "", keys, keys))
+        names = [by] + ([] if by == 'currency' else ['currency']) + ['amount', 'count', 'pending']
+        return [dict(zip(names, row)) for row in self.db.execute(sql, args)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-ledger", description="Local sqlite ledger of /account/transactions")
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--db', default='mrr_ledger.sqlite')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('sync', help='pull new and still-pending transactions')
+    totals = commands.add_parser('totals', help='aggregate the local ledger')
+    totals.add_argument('--by', choices=sorted(GROUPINGS), default='currency')
+    totals.add_argument('--since', type=int, help='unix timestamp')
+    totals.add_argument('--until', type=int, help='unix timestamp')
+    args = parser.parse_args(argv)
+
+    ledger = Ledger(args.db)
+    try:
+        if args.command == 'sync':
+            with MRR(args.key, args.secret) as client:
+                print(json.dumps({'stored': ledger.sync(client)}))
+        else:
+            for row in ledger.totals(args.by, args.since, args.until):
+                print(json.dumps(row))
+    finally:
+        ledger.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
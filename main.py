@@ -1,62 +1,189 @@
+import argparse
 import hashlib
 import hmac
 import json
+import logging
+import os
+import queue
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from logging.handlers import QueueHandler, QueueListener
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+
+from cache import ResponseCache
+from endpoints import (BY_COMMAND, BY_NAME, ENDPOINTS, FIELDS, GROUPS, ID_LISTS, NOTES, call, fields, menu_text,
+                       placeholders, validate)
+from fastjson import loads, stream_array
+from graph import parse_graph
+from metrics import Metrics
+from replay import Recorder, replay_server
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Signs requests for one key pair. The HMAC is keyed (and fed the api key,
+# which starts every string to sign) once, then copied for each request.
+class Signer:
+    def __init__(self, key, secret):
+        self.key = key
+        self._hmac = hmac.new(secret.encode(), key.encode(), hashlib.sha1)
+        self._headers = {
+            'Content-Type': 'application/json',
+            'x-api-key': key,
+        }
+        self._last = 0
+        self._lock = threading.Lock()
+    
+    # Strictly increasing nonce in microseconds, safe across threads
+    def nonce(self):
+        with self._lock:
+            self._last = max(time.time_ns() // 1000, self._last + 1)
+            return str(self._last)
+    
+    # Full uri and signed headers for an endpoint
+    def sign(self, root_uri, endpoint):
+        # If there are any url params, remove them for the signature
+        path = endpoint.split("?", 1)[0]
+        nonce = self.nonce()
+        
+        # String to sign is api_key + nonce + endpoint, signed with a sha1 hmac
+        sign = self._hmac.copy()
+        sign.update((nonce + path).encode())
+        
+        headers = self._headers.copy()
+        headers['x-api-nonce'] = nonce
+        headers['x-api-sign'] = sign.hexdigest()
+        return root_uri + endpoint, headers
+
+# Response sinks receive (type, uri, response text) after each request
+def print_sink(type, uri, text):
+    print(f"{type} {uri} : {text}")
+
+# Hands responses to `handler` through a queue, so request threads never
+# block on output
+class LogSink:
+    def __init__(self, handler=None, level=logging.INFO, name="mrr.responses"):
+        self.level = level
+        self._queue = queue.SimpleQueue()
+        self._logger = logging.getLogger(name)
+        self._handler = QueueHandler(self._queue)
+        self._logger.addHandler(self._handler)
+        self._propagate = self._logger.propagate
+        self._logger.propagate = False
+        # The logger would otherwise take root's WARNING level and drop every response
+        self._logger_level = self._logger.level
+        self._logger.setLevel(level)
+        self._listener = QueueListener(self._queue, handler or logging.StreamHandler())
+        self._listener.start()
+    
+    def __call__(self, type, uri, text):
+        self._logger.log(self.level, "%s %s : %s", type, uri, text)
+    
+    # Detach from the logger too, so a sink made again under the same name
+    # does not hand every response to the stopped queue as well
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._logger.propagate = self._propagate
+        self._logger.setLevel(self._logger_level)
+        self._listener.stop()
+
+# Raised when the api answers a call with an error or a non-200 status
+class MRRError(Exception):
+    pass
+
 class MRR:
     # Root URI for the api
     root_uri = "https://www.miningrigrentals.com/api/v2"
     
-    decode = True
-    pretty = False
-    print_output = False
+    # Most ids joined into one ID1;ID2;ID3 path, and the longest such id list
+    batch_size = 100
+    batch_chars = 1500
     
-    def __init__(self, key, secret):
+    # Instances hold no per-call state, so one client can be shared by many
+    # threads. decode and pretty are defaults that each call may override.
+    def __init__(self, key, secret, pool_size=10, timeout=(5, 30), decode=True, pretty=False, sink=None):
         # Define the api_key and api_secret on construct
         self.key = key
         self.secret = secret
+        self.signer = Signer(key, secret)
+        self.decode = decode
+        self.pretty = pretty
+        # Optional callable(type, uri, text) given every response, see LogSink
+        self.sink = sink
+        # Max keep-alive connections kept open to the api host
+        self.pool_size = pool_size
+        # (connect, read) timeouts in seconds, passed to every request
+        self.timeout = timeout
+        # Optional cache.ResponseCache for rarely changing GET endpoints
+        self.cache = None
+        # Optional scheduler.Scheduler for rate limiting, priorities and retries
+        self.scheduler = None
+        # Optional requests adapter mounted in place of the pooled HTTPAdapter,
+        # e.g. replay.Recorder to capture every exchange
+        self.transport = None
+        # Objects with before(type, endpoint, parms) and after(type, endpoint,
+        # status, seconds, sent, received, retries) methods, see metrics.Metrics
+        self.hooks = []
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    # Pooled keep-alive session, built on first use and shared by every call and
+    # thread. The urllib3 pool is thread-safe and blocks once pool_size connections
+    # are busy; cookies are refused so the session itself carries no state.
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = self.transport
+                    if adapter is None:
+                        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.verify = False
+                    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                    session.headers.update({'Connection': 'keep-alive'})
+                    self._session = session
+        return self._session
+    
+    # Drop the pooled connections, a new session is built on the next call
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     # Raw query function -- includes signing the request
-    def query(self, type, endpoint, parms={}):
-        rest = ""
-        # If there are any url params, remove them for the signature
-        if "?" in endpoint:
-            arr = endpoint.split("?")
-            endpoint = arr[0]
-            rest = "?" + arr[1]
-        
-        # URI is our root_uri + the endpoint
-        uri = self.root_uri + endpoint + rest
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': self.key,
-            'x-api-nonce': str(time.time()),
-        }
+    def query(self, type, endpoint, parms={}, headers=None, pretty=None):
+        if self.pretty if pretty is None else pretty:
+            endpoint += "&pretty" if "?" in endpoint else "?pretty"
         
-        # String to sign is api_key + nonce + endpoint
-        sign_string = self.key + headers['x-api-nonce'] + endpoint
+        cacheable = self.cache is not None and type == "GET" and self.cache.ttl(endpoint)
+        if cacheable:
+            data = self.cache.get(endpoint, parms)
+            if data is not None:
+                return {'status': 200, 'header': {}, 'data': data}
+        elif self.cache is not None and type != "GET":
+            self.cache.invalidate(endpoint)
         
-        # Sign the string using a sha1 hmac
-        sign = hmac.new(self.secret.encode(), sign_string.encode(), hashlib.sha1).hexdigest()
+        response = self._send(type, endpoint, parms, headers)
         
-        headers['x-api-sign'] = sign
+        if self.sink is not None:
+            self.sink(type, self.root_uri + endpoint, response.text)
         
-        # Curl request
-        response = requests.request(type, uri, headers=headers, json=parms, verify=False)
-        
-        if self.pretty:
-            if "?" in uri:
-                uri += "&pretty"
-            else:
-                uri += "?pretty"
-        
-        if self.print_output:
-            print(f"{type} {uri} : {response.text}")
+        if cacheable and response.status_code == 200:
+            self.cache.put(endpoint, parms, response.text)
         
         return {
             'status': response.status_code,
@@ -64,532 +191,393 @@ class MRR:
             'data': response.text
         }
     
-    def parse_return(self, array):
+    # Request over the pooled keep-alive session, signed afresh for every attempt
+    def _send(self, type, endpoint, parms, headers=None, stream=False):
+        attempts = 0
+        
+        def send():
+            nonlocal attempts
+            attempts += 1
+            uri, signed = self.signer.sign(self.root_uri, endpoint)
+            if headers:
+                signed.update(headers)
+            return self.session.request(type, uri, headers=signed, json=parms, timeout=self.timeout, stream=stream)
+        
+        def submit():
+            if self.scheduler is not None:
+                return self.scheduler.submit(type, endpoint, send)
+            return send()
+        
+        # Without hooks a call costs one truth test over the plain request
+        hooks = self.hooks
+        if not hooks:
+            return submit()
+        
+        for hook in hooks:
+            hook.before(type, endpoint, parms)
+        began = time.perf_counter()
+        try:
+            response = submit()
+        except Exception:
+            for hook in hooks:
+                hook.after(type, endpoint, None, time.perf_counter() - began, 0, 0, max(attempts - 1, 0))
+            raise
+        seconds = time.perf_counter() - began
+        sent = len(response.request.body or b'')
+        # A streamed body has not been read yet, so only its declared length is known
+        if stream:
+            received = int(response.headers.get('Content-Length') or 0)
+        else:
+            received = len(response.content)
+        for hook in hooks:
+            hook.after(type, endpoint, response.status_code, seconds, sent, received, attempts - 1)
+        return response
+    
+    # Yield the records of the `field` array of a response while it downloads
+    # ('records' for /rig search, 'data' for /rig/mine), never holding the whole
+    # body or decoded tree. Bypasses the cache and the sink.
+    def stream(self, type, endpoint, field, parms={}, chunk_size=65536):
+        with self._send(type, endpoint, parms, stream=True) as response:
+            if response.status_code != 200:
+                raise MRRError({'status': response.status_code, 'header': response.headers, 'data': response.text})
+            try:
+                yield from stream_array(response.iter_content(chunk_size), field)
+            except ValueError as error:
+                raise MRRError(str(error))
+    
+    def parse_return(self, array, decode=None):
         if array["status"] != 200:
             return array
         else:
-            if self.decode:
-                return json.loads(array["data"])
+            if self.decode if decode is None else decode:
+                return loads(array["data"])
             else:
                 return array["data"]
     
     # Helper aliases just to make things easier
-    def get(self, endpoint, parms={}):
-        return self.parse_return(self.query("GET", endpoint, parms))
+    def get(self, endpoint, parms={}, decode=None, pretty=None):
+        return self.parse_return(self.query("GET", endpoint, parms, pretty=pretty), decode)
     
-    def post(self, endpoint, parms={}):
-        return self.parse_return(self.query("POST", endpoint, parms))
+    def post(self, endpoint, parms={}, decode=None, pretty=None):
+        return self.parse_return(self.query("POST", endpoint, parms, pretty=pretty), decode)
     
-    def put(self, endpoint, parms={}):
-        return self.parse_return(self.query("PUT", endpoint, parms))
+    def put(self, endpoint, parms={}, decode=None, pretty=None):
+        return self.parse_return(self.query("PUT", endpoint, parms, pretty=pretty), decode)
     
-    def delete(self, endpoint, parms={}):
-        return self.parse_return(self.query("DELETE", endpoint, parms))
-
-key = ""
-secret = ""
-mrr = MRR(key, secret)
-mrr.decode = True
-mrr.pretty = True
-mrr.print_output = True
+    def delete(self, endpoint, parms={}, decode=None, pretty=None):
+        return self.parse_return(self.query("DELETE", endpoint, parms, pretty=pretty), decode)
+    
+    # Dedupe ids (keeping order) and split them into url-length-safe chunks
+    def chunk_ids(self, ids):
+        chunks = []
+        chunk = []
+        chars = 0
+        for id in dict.fromkeys(str(id).strip() for id in ids):
+            if not id:
+                continue
+            if chunk and (len(chunk) >= self.batch_size or chars + len(id) + 1 > self.batch_chars):
+                chunks.append(chunk)
+                chunk = []
+                chars = 0
+            chunk.append(id)
+            chars += len(id) + 1
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    # Call a multi-id endpoint such as "/rig/{ids}/threads" for any number of ids.
+    # Chunks are sent in parallel over the pooled session and merged into
+    # {'success': bool, 'data': {id: record}, 'errors': [failed chunk responses]}
+    def batch(self, type, template, ids, parms={}):
+        chunks = self.chunk_ids(ids)
+        result = {'success': True, 'data': {}, 'errors': []}
+        if not chunks:
+            return result
+        
+        def send(chunk):
+            return chunk, self.query(type, template.format(ids=";".join(chunk)), parms)
+        
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.pool_size)) as pool:
+            for chunk, response in pool.map(send, chunks):
+                body = loads(response['data']) if response['status'] == 200 else None
+                if not body or not body.get('success'):
+                    result['success'] = False
+                    result['errors'].append(body or response)
+                    continue
+                result['data'].update(merge_records(chunk, body['data']))
+        return result
+    
+    def batch_get(self, template, ids, parms={}):
+        return self.batch("GET", template, ids, parms)
+    
+    # Graph columns per id for /rig/{ids}/graph or /rental/{ids}/graph, see graph.parse_graph
+    def graphs(self, template, ids, parms={}):
+        result = self.batch_get(template, ids, parms)
+        if not result['success']:
+            raise MRRError(result['errors'])
+        return {id: parse_graph(record) for id, record in result['data'].items()}
+    
+    def rig_graphs(self, ids, parms={}):
+        return self.graphs("/rig/{ids}/graph", ids, parms)
+    
+    def rental_graphs(self, ids, parms={}):
+        return self.graphs("/rental/{ids}/graph", ids, parms)
+    
+    # Lazily walk a start/limit paginated listing, yielding one record at a time.
+    # With prefetch the next page is requested while the caller works on this one,
+    # so at most two pages are held in memory however long the history is.
+    def paginate(self, endpoint, field, page_size=100, prefetch=True, **filters):
+        def fetch(start):
+            response = self.query("GET", endpoint, dict(filters, start=start, limit=page_size))
+            body = loads(response['data']) if response['status'] == 200 else None
+            if not body or not body.get('success'):
+                raise MRRError(body or response)
+            return body['data']
+        
+        start = filters.pop('start', 0)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            data = fetch(start)
+            while True:
+                records = data.get(field) or []
+                start += len(records)
+                more = len(records) == page_size and start < int(data.get('total', start + 1))
+                upcoming = pool.submit(fetch, start) if more and prefetch else None
+                yield from records
+                if not more:
+                    break
+                data = upcoming.result() if upcoming else fetch(start)
+    
+    # Every marketplace rig for an algo, streamed page by page from /rig search
+    def iter_rigs(self, type, page_size=100, **filters):
+        offset = filters.pop('offset', 0)
+        while True:
+            count = 0
+            for rig in self.stream("GET", "/rig", 'records', dict(filters, type=type, count=page_size, offset=offset)):
+                count += 1
+                yield rig
+            offset += count
+            if count < page_size:
+                return
+    
+    # Your rigs, streamed from /rig/mine
+    def iter_my_rigs(self, **filters):
+        return self.stream("GET", "/rig/mine", 'data', filters)
+    
+    # Every transaction matching the /account/transactions filters (algo, type, rig, ...)
+    def iter_transactions(self, page_size=100, prefetch=True, **filters):
+        return self.paginate("/account/transactions", 'transactions', page_size, prefetch, **filters)
+    
+    # Every rental matching the /rental filters (type, algo, history, rig, currency)
+    def iter_rentals(self, page_size=100, prefetch=True, **filters):
+        return self.paginate("/rental", 'rentals', page_size, prefetch, **filters)
+
+# Key the data of a multi-id response by id. A single id returns a bare
+# record rather than a list, and records name their id differently per endpoint.
+# Data that cannot be told apart per id is kept whole under the chunk's joined ids.
+def merge_records(chunk, data):
+    records = data if isinstance(data, list) else [data]
+    merged = {}
+    for index, record in enumerate(records):
+        id = None
+        if isinstance(record, dict):
+            for field in ('id', 'rigid', 'rentalid'):
+                if field in record:
+                    id = str(record[field])
+                    break
+        if id is None and len(records) == len(chunk):
+            id = chunk[index]
+        if id is None:
+            return {";".join(chunk): data}
+        merged[id] = record
+    return merged
+
+# Credentials for the interactive menu; see accounts.py for more than one account
+key = os.environ.get("MRR_KEY", "")
+secret = os.environ.get("MRR_SECRET", "")
+mrr = MRR(key, secret, pretty=True, sink=print_sink)
+# Set MRR_CACHE to a sqlite file to keep /info/* responses between runs
+if os.environ.get("MRR_CACHE"):
+    mrr.cache = ResponseCache(path=os.environ["MRR_CACHE"])
 
 # Test connectivity
 
 
 
-def main():
+def menu(client=mrr):
+    text = None
     while True:
         
         input('press enter to continue ...')
-
-
-        print('''
-    0 - Information - Test connectivity and return information about you
-
-    1 - Information - Get a list of MRR rig servers. Please note the port and ethereum_port entries are depreciated, port information is dependant on your rig.
-        Please see /rig/port for that information.
-
-    2 - Information - Get all algos and statistics for them (suggested price, unit information, current rented hash/etc)
-
-    3 - Information - Get statistics for an algo (suggested price, unit information, current rented hash/etc)
-
-    4 - Information - Get a list of currencies currently used for payments that are installed into our system.
-        The currency may be enabled or disabled, disabled means that no function with that currency should work or attempted to be performed.
-        Pair with /account/currencies endpoint. Each account has a seperate currency enablement status.
-        We may add or disable a currency at any time. txfee is the current fee being charged for withdraw, it *may* change every 15 minutes.
-
-    5 - Account - Retrieve account information
-
-    6 - Account - Retrieve account balances
-
-    7 - Account - Request a payout/withdrawal. This endpoint is disabled until we can find a way to offer this without risk.          
-
-    8 - Account - List/search transaction history. `id`:always, `type`:always, `currency`:always, `amount`:always; and is negative when a deduction, `when`:always as UTC.
-        `rental`,`rig`:only when not (`type` = ('Payout' or 'Deposit')).
-        `txid`:only when `type` = ('Payout' or 'Deposit').
-        `txfee`,`payout_address`:only when `type` = 'Payout'.
-        `sent`: only when `sent`='no' and `type` = 'Payout'.
-        `status`:always and is 'Cleared' or 'Pending',`pending_seconds`:always and is non 0 when `status` = 'Pending'.
-        `info`: only when not (`type` = ('Payout' or 'Deposit')) and there is an extra comment/info for the transaction.
-
-    9 - Account - List all pool profiles, or list by algo
-
-    10 - Account - Create a pool profile
-
-    11 - Account - Get a specific pool profile
-
-    12 - Account - Add or replace a pool to the profile
-
-    13 - Account - Add or replace a pool to a profile
-
-    14 - Account - Delete a specific pool profile
-
-    15 - Account -est a pool to verify connectivity/functionality with MRR. This endpoint is now active.
-        Simple or full test; Simple verifies connectivity to the host and port only.
-        Full test takes in user, password and the algorithm type which is then used to pick the stratum type to check against the pool.
-        extramethod is used to specify an ethhash/ether_stratum protocol version, default is auto detection. 
-        Test source can be specified as one of our available rig servers. Test may choose to fall back to simple test if there is a configuration failure. 
-        error array is used for internal error, error string in result may contain a description of any problem encountered.
-        Output: simple test returns 'source' test server; the 'dest' / destination pool; an 'error' code (usually 'none'); 'connection' is true if we were able to succesfully connect to the pool; 'executiontime' records how long the test took. 
-        A test call can take up to 10-20 seconds when all failures are present.Output: full test contains all the same as simple plus; 
-        'protocol' the chosen test protocol; if 'sub' is present then the protocol contains a mining subscription - true if sent valid response; 
-        'auth' is true if the authorization response was accepted by the pool; if 'red' is present then the protocol may send a 'client.reconnect', if it is true this means the pool is incompatible with MRR; 
-        'diffs' is true when pool has set mining difficulty, 'diff' is the difficulty it sent; 'work' is true when the pool has sent a valid work broadcast; 
-        'ssl' is true if the pool tested as being ssl/tls compatible and the test used ssl/tls to connect; if 'xnonce' is present and true it means the pool accepts mining.extranonce.
-        A valid and complete test in which the pool is compatible with MRR: connection: true, sub: true, auth: true, red: false, diffs: true, diff: >0, work: true. 
-        Please do not abuse the test or hammer pools as they may block us and our miners!
-
-    16 - Account - List saved pools
-
-    17 - Account - Get saved pools
-
-    18 - Account - Create a saved pool
-
-    19 - Account - Update saved pools
-
-    20 - Account - Delete saved pools
-
-    21 - Account - Get a list of currencies currently used for payments that are enabled/disabled for your account. 
-        If a currency is disabled for your account, you may not have access to some functions or data using that currency. 
-        We use this to enable or disable a currency on our platform, we may add or disable a currency at any time.
-
-    22 - Rig - Search for rigs on a specified algo. This is identical to the main rig list pages.
-
-    23 - Rig - List my rigs
-
-    24 - Rig - Get 1 or more rigs by ID
-
-    25 - Rig - Create a rig
-
-    26 - Rig - Update a batch of rigs using a 'rigs' array.
-
-    27 - Rig - Delete 1 or more rigs by ID
-
-    28 - Rig - For Rig Owners: Extend a rental to donate time to the renter -- Assuming an active rental is in progress.
-               Extension length must be at least 1 minute (0.0166666666666666 hours).
-               Inputs 'hours' and 'minutes' are additive to eachother, for example 0.23343 hours and 2 minutes, are added to the Extension length.
-               Must have at least one of the arguments.
-
-    29 - Rig - Batch endpoint - For Rig Owners: Extend a rental using a list of rigs in order to donate time to the renter -- Assuming an active rental is in progress. 
-               Extension length must be at least 1 minute (0.0166666666666666 hours). Inputs 'hours' and 'minutes' are additive to eachother, for example 0.23343 hours and 2 minutes, are added to the Extension length.
-               Must have at least one of the arguments and are specified individually for each rig.
-
-    30 - Rig - Apply a pool profile to one or more rigs
-
-    31 - Rig - List pools assigned to one or more rigs.
-
-    32 - Rig - Add or replace a pool on one or more rigs
-
-    33 - Rig - Delete a pool on one or more rigs
-
-    34 - Rig - Get a direct port # to use inplace of 3333 when connecting to our servers.
-
-    35 - Rig - Obtain a list of currently active threads for a rig or list of rigs. Note that information output can change depending on level of access, public, renter, or owner. 
-               If you are the renter of the rig, access changes to renter and you can see more information than public view for the rig.
-               If you are the owner of the rig you can see all the information for your rig.
-
-    36 - Rig - Obtain a rigs graph information. Historical hashrate bars, average, rejected rate, rental periods, offline periods and pool offline periods. 
-              "bars","average","rejected" are all strings that contain [] delimited array, consisting of a unix timestamp in miliseconds followed by the numerical hashrate value. 
-              "rentals","offline","pooloffline" are comma delimited array, contain unix timestamps in miliseconds for start and end pair of each period seperated by : (colon). 
-              For current rigs the lastest timestamp will be the latest minute period processed by our system.
-
-    37 - Rig Groups - Get a list of your rig groups
-
-    38 - Rig Groups - Create a rig group
-
-    39 - Rig Groups - Get a rig group's details
-
-    40 - Rig Groups - Update a rig group
-
-    41 - Rig Groups - Delete a rig group
-
-    42 - Rig Groups - Adds one or more rigs to your rig group. Note, rigs can only be part of one group at a time.
-
-    43 - Rig Groups - Removes one or more rigs from your rig group. Note, rigs can only be part of one group at a time.
-
-    44 - Rental - Lists rentals
-                  Note: Average hashrate information is removed over time. Historical rentals may show a "0%"  average hashrate even if they hashed properly.
-                  We prune this data to minimize storage space.
-
-    45 - Rental - Get information on rentals by rental ID.
-
-    46 - Rental - Create a new rental
-
-    47 - Rental - Apply a pool profile to one or more rentals
-
-    48 - Rental - List pools assigned to one or more rentals.
-
-    49 - Rental - Add or replace a pool on one or more rentals
-
-    50 - Rental - Delete a pool on one or more rentals
-
-    51 - Rental - Purchase an extension on one more rentals
-
-    52 - Rental - Obtain a rental graph information. Historical hashrate bars, average, rejected rate, rental periods, offline periods and pool offline periods.
-                 "bars","average","rejected" are all strings that contain [] delimited array, consisting of a unix timestamp in miliseconds followed by the numerical hashrate value.
-                 "offline","pooloffline" are comma delimited array, contain unix timestamps in miliseconds for start and end pair of each period seperated by : (colon).
-                 "rentals" is always none. time_start and time_end contain textual display of start and end time of the rental.
-                 Please note that for long rentals it can take some time to generate a graph, and even longer if you select more then one of them so please be sparing in the use of this.
-
-    53 - Rental - Obtain 'Activity Log' detail messages on one or more of your rentals.
-                  Your view will depend on if you are the renter, or the rig owner.
-                  Return data is an array if more then one rental is requested, if single rental then the log is not in an array.
-
-    54 - Rental - Obtain messages on one or more of your rentals.
-
-    55 - Rental - Send a message to one or more of your rentals.
-
-    56 - Pricing - List of marketplace pricing rates.
-
-
-
-
-    ''')
+        
+        if text is None:
+            text = menu_text()
+        print(text)
         try:
             command = int(input('Enter number of your command:'))
         except ValueError:
             print("Invalid input. Please enter a number.")
             continue
-
-
-        if command == 0:
-            mrr.get("/whoami")
-
-        elif command == 1:
-            mrr.get("/info/servers")
-
-        elif command == 2:
-            mrr.get("/info/algos")
-
-        elif command == 3:
-            algo = input('Enter the name of the algo').upper()
-            mrr.get("/info/algos/{algo}".format(algo=algo))
-
-        elif command == 4:
-            mrr.get("/info/currencies")
-
-        elif command == 5:
-            mrr.get("/account")
-
-        elif command == 6:
-            mrr.get("/account/balance")
-
-        # elif command == 7:           
-        #     mrr.put("/account/balance")
-
-        elif command == 8:
-            start = int(input('Enter Start number (for pagination):'))
-            limit = int(input('Enter Limit number (for pagination):'))
-            algo = input('Enter the name of the algo(Algo to filter -- see /info/algos)').upper()
-            type = input('Type to filter -- one of [credit,payout,referral,deposit,payment,credit/refund,debit/refund,rental fee]')
-            rig = int(input('Filter to specific rig.'))
-            rental = int(input('Filter to specific rental.'))
-            txid = input('Filter to specific txid.')
-            time_greater_eq = input('Filter to greater then or equal, as Unix Timestamp integer.')
-            time_less_eq = input('Filter to less then or equal, as Unix Timestamp integer.')
-            parms = {'start':start,'limit':limit,'algo':algo,'type':type,'rig':rig,'rental':rental,'txid':txid,'time_greater_eq':time_greater_eq,'time_less_eq':time_less_eq}
-            mrr.get("/account/transactions",parms=parms)
-
-        elif command == 9:
-            algo = input('Enter the name of the algo(Algo to filter -- see /info/algos)').upper()
-            parms = {'algo':algo}
-            if algo:
-                mrr.get("/account/profile", parms=parms)
-            mrr.get("/account/profile")
-
-        elif command == 10:
-            name = input('Name of the profile')
-            algo = input('Enter the name of the algo(Algo to filter -- see /info/algos)').upper()
-            parms = {'name': name, 'algo': algo}
-            mrr.put("/account/profile", parms=parms)
-
-        elif command == 11:
-            Id = input('Enter the profile ID:')
-            mrr.get("/account/profile/{Id}".format(Id=Id))
-
-        elif command == 12:
-            Id = input('Enter the profile ID:')
-            poolId = int(input('Pool ID to add -- see /account/pools'))
-            priority = int(input('Enter the priority(0-4)'))
-            parms = {'poolid': poolId,'priority': priority}
-            mrr.put("/account/profile/{Id}".format(Id=Id),)
-
-        elif command == 13:
-            Id = input('Enter the profile ID:')
-            poolId = int(input('Pool ID to add -- see /account/pools'))
-            priority = int(input('Enter the priority(0-4)'))
-            parms = {'poolid': poolId}
-            mrr.put("/account/profile/{Id}/{priority}".format(Id=Id, priority=priority),parms=parms)
-
-        elif command == 14:
-            Id = input('Enter the profile ID:')
-            mrr.delete("/account/profile/{Id}".format(Id=Id))
-
-        elif command == 15:
-            method = input('Can be one of simple or full')
-            extramethod = input('''Currently intended to use for hashimotos/ubiqhash/etchash algo type name / ether_stratum protocol.
-                                 default is esm0(auto detect); can be [esm0,esm1,esm2,esm3].''')
-            Type = input('''The algorithm type name, such as scrypt,sha256,hashimotos,x11. See /info/algos.
-                          This determnes the protocol used in the test. Required when using 'full' test method.''')
-            host = input('Url or host address of the pool. Can include port.')
-            port = int(input('Port to connect to the pool host, required if no port is set in the host parameter.'))
-            user = input('User to attempt to authenticate with the pool. Required when using full test method.')
-            Pass = input('Password sent with authentication to the pool. Required when using full test method.')
-            source = input('''Source MRR server to test from, one of 
-                           [us-central01,us-east01,us-west01,us-nw01,us-south01,ca-tor01,ap-01,au-01,eu-uk01,eu-01,
-                           eu-ru01,eu-ru02,eu-de01,eu-de02,jp-01,sa-br01,us-tx01,hk-01,ru-kra01,in-01]''')
-            parms = {'method':method,'extramethod':extramethod,'type':Type,'host':host,'port':port,'user':user,'pass':Pass,'source':source}
-            mrr.put("/account/pool/test", parms=parms)
-
-        elif command == 16:
-            mrr.get("/account/pool")
-
-        elif command == 17:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/account/pool/{ids}".format(ids=ids))
-
-        elif command == 18:
-            type = input('Pool algo, eg: sha256, scrypt, x11, etc')
-            name = input('Name to identify the pool with')
-            host = input('Pool host, the part after stratum+tcp://')
-            port = int(input('Pool port, the part after the : in most pool host strings'))
-            user = input('Your workername')
-            Pass = input('Worker Password')
-            note = input('Additional notes to help identify the pool for you')
-            parms = {'type': type,'name':name,'host':host,'port':port,'user':user,'pass':Pass,'note':note}
-            mrr.put("/account/pool",parms=parms)
-
-        elif command == 19:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            name = input('Name to identify the pool with')
-            host = input('Pool host, the part after stratum+tcp://')
-            port = int(input('Pool port, the part after the : in most pool host strings'))
-            user = input('Your workername')
-            Pass = input('Worker Password')
-            note = input('Additional notes to help identify the pool for you')
-            parms = {'name':name,'host':host,'port':port,'user':user,'pass':Pass,'note':note}
-            mrr.put("/account/pool/{ids}".format(ids=ids),parms=parms)
-
-        elif command == 20:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.delete("/account/pool/{ids}".format(ids=ids))
-
-        elif command == 21:
-            mrr.get("/account/currencies")
-
-        elif command == 22:
-            type = input('Pool algo, eg: sha256, scrypt, x11, etc')
-            parms = {'type': type}
-            mrr.get("/rig")
-
-        elif command == 23:
-            type = input('Pool algo, eg: sha256, scrypt, x11, etc')
-            parms = {'type': type,'hashrate':True}
-            mrr.get("/rig/mine")
-
-        elif command == 24:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rig/{ids}".format(ids=ids))
-
-        elif command == 25:
-            name = input("Name of rig:")
-            server = input('Server name -- see /info/servers:')
-            parms = {'name':name, 'server':server} 
-            mrr.put("/rig",parms=parms)
-
-        elif command == 26:
-            id = input("Rig ID:")
-            parms = {'id':id}
-            mrr.post("/rig/batch",parms=parms)
-
-        elif command == 27:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.delete("/rig/{ids}".format(ids=ids))
-
-        elif command == 28:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.put("/rig/{ids}}/extend".format(ids=ids))
-
-        elif command == 29:
-            id = int(input('Enter the Rig ID:'))
-            hours = float(input('Enter the Hours to extend by'))
-            minutes = float(input('Enter the Minutes to extend by'))
-            parms = {'id': id, 'hours': hours, 'minutes': minutes}
-            mrr.post("/rig/batch/extend")
-
-        elif command == 30:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            profile = int(input('enter a profile ID to apply -- see /account/profile:'))
-            parms = {'profile': profile}
-            mrr.put("/rig/{ids}/profile".format(ids=ids),parms=parms)
-
-        elif command == 31:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rig/{ids}/pool".format(ids=ids))
-
-        elif command == 32:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            host = input('Pool host, the part after stratum+tcp://')
-            port = int(input('Pool port, the part after the : in most pool host strings'))
-            user = input('Your workername')
-            Pass = input('Worker Password')
-            parms = {'host': host, 'port': port, 'user': user, 'pass': Pass}
-            mrr.put("/rig/{ids}/pool".format(ids=ids))
-
-        elif command == 33:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            priority = int(input('Enter the priority(0-4)'))
-            parms = {'priority': priority}
-            mrr.delete("/rig/{ids}/pool".format(ids = ids))
-
-        elif command == 34:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rig/{ids}/port".format(ids=ids))
-
-        elif command == 35:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rig/{ids}/threads".format(ids=ids))
-
-        elif command == 36:
-            ids = input('Enter an ID or IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rig/{ids}}/graph".format(ids=ids))
-
-        elif command == 37:
-            mrr.get("/riggroup")
-
-        elif command == 38:
-            name = input('Enter A name to represent your rig group:')
-            parms = {'name': name}
-            mrr.put("/riggroup", parms=parms)
-
-        elif command == 39:
-            id = input('Enter A Rig Group ID:')
-            mrr.get("/riggroup/{id}".format(id=id))
-
-        elif command == 40:
-            id = input('Enter A Rig Group ID:')
-            name = input('Enter A name to represent your rig group:')
-            enabled = int(input('''1 is enabled, 0 is disabled.
-                                 Disabling a rig group will prevent the rental triggers that disable other rigs in the group.'''))
-            rental_limit = int(input('The number of active rentals allowed on a group before disabling the other rigs in the group (Typically this will always be 1)'))
-            parms = {'name':name, 'enabled':enabled, 'rental_limit':rental_limit}
-            mrr.put("/riggroup/{id}".format(id=id),parms=parms)
-
-        elif command == 41:
-            id = input('Enter A Rig Group ID:')
-            mrr.delete("/riggroup/{id}".format(id=id))
-
-        elif command == 42:
-            id = input('Enter A Rig Group ID:')
-            rigIds = input('Enter an  rig ID or rig IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.post("/riggroup/{id}/add/{rigids}".format(id=id,rigIds=rigIds))
-
-        elif command == 43:
-            id = input('Enter A Rig Group ID:')
-            rigIds = input('Enter an  rig ID or rig IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.post("/riggroup/{id}/remove/{rigids}".format(id=id,rigIds=rigIds))
-
-        elif command == 44:
-            type = input('Enter the type. Type is one of [owner,renter] -- owner means rentals on your rigs, renter means rentals you purchased')
-            algo = input('Enter the algorithm, Filter by algo, see /info/algos')
-            history = bool(input('Enter true/false. true = Show completed rentals, false = Active rentals'))
-            rig = int(input('Enter the rig ID, to Show rentals related to a specific rig ID'))
-            start = int(input('Enter Start number (for pagination):'))
-            limit = int(input('Enter Limit number (for pagination):'))
-            currency = input('Enter Currency to Filter by rentals paid currency, one of (BTC,LTC,ETH,DASH):')
-            parms = {'type':type,'algo':algo,'history':history,'rig':rig,'start':start,'limit':limit,'currency':currency}
-            mrr.get("/rental",parms=parms)
-
-        elif command == 45:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rental/{ids}".format(ids=ids))
-
-        elif command == 46:
-            rig = int(input('Enter Rig ID to rent:'))
-            length = float(input('Enter Length in hours to rent:'))
-            profile = int(input('Enter The profile ID to apply (see /account/profile)'))
-            currency = input('Enter Currency to use, one of (BTC,LTC,ETH,DASH):')
-            rate_type = input('Enter The hash type of rate. defaults to "mh", possible values: [hash,kh,mh,gh,th]')
-            rate_price = float(input("Enter Price per [rate.type] per day to pay -- this is a filter only, it will use the rig's current price as long as it is <= this value"))
-            parms = {'rig':rig,'length':length,'profile':profile,'currency':currency,'rate.type':rate_type,'rate.price':rate_price}
-            mrr.put("/rental",parms=parms)
-
-        elif command == 47:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            profile = int(input('Enter Profile ID to apply -- see /account/profile'))
-            parms = {'profile':profile}
-            mrr.put("/rental/{ids}}/profile".format(ids=ids),parms=parms)
-
-        elif command == 48:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rental/{ids}/pool".format(ids=ids))
-
-        elif command == 49:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            host = input('Pool host, the part after stratum+tcp://')
-            port = int(input('Pool port, the part after the : in most pool host strings'))
-            user = input('Your workername')
-            Pass = input('Worker Password')
-            priority = int(input('Enter priority 0-4 -- can be passed in after pool/ instead.'))
-            parms = {'ids':ids,'host':host, 'port':port, 'user':user, 'pass':Pass, 'priority':priority}
-            mrr.put("/rental/{ids}/pool".format(ids=ids), parms=parms)
         
-        elif command == 50:
-            priority = int(input('Enter priority 0-4 -- can be passed in after pool/ instead.'))            
-            parms = {'priority':priority}
-            mrr.delete("/rental/{ids}/pool".format(ids=ids),parms=parms)
-
-        elif command == 51:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            length = float(input('Enter Length in hours to purchase an extension for:'))
-            parms = {'length': length}
-            mrr.put("/rental/{ids}/extend".format(ids=ids),parms=parms)
-
-        elif command == 52:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.put("/rental/{ids}}/graph".format(ids=ids))
-
-        elif command == 53:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rental/{ids}/log".format(ids=ids))
-
-        elif command == 54:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            mrr.get("/rental/{ids}/message".format(ids=ids))
-
-        elif command == 55:
-            ids = input('Enter an rental ID or rental IDs in this format -> ID1;ID2;ID3 ...')
-            message = input('Enter The message to add to a rental:')
-            parms = {'message':message}
-            mrr.put("/rental/{ids}/message".format(ids=ids),parms=parms)
-
-        elif command == 56:
-            mrr.get("/pricing")
-
-        else:
+        endpoint = BY_COMMAND.get(command)
+        if endpoint is None:
             print("Invalid command number. Please try again.")
-
-
+            continue
+        
+        # Prompt for every path value and param; blank params are left out
+        values = {param.name: input(param.help.rstrip(':') + ': ') for param in fields(endpoint)}
+        try:
+            call(client, endpoint, values)
+        except ValueError as error:
+            print(error)
+
+# Non-interactive subcommands generated from endpoints.ENDPOINTS,
+# e.g. `main.py rig threads 1;2;3` or `main.py rental extend 7 --length 2`.
+# Only the subcommands of `group` are built when it is given.
+def build_parser(group=None):
+    parser = argparse.ArgumentParser(prog="mrr", description="Command line client for the MiningRigRentals api")
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--format', choices=('json', 'ndjson'), default='json',
+                        help='one json document, or one json line per record')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='run every {"command": "rig threads", "ids": "1;2", ...} line of a jsonl file')
+    parser.add_argument('--jobs', type=int, default=1, help='calls in flight at once in --batch mode')
+    parser.add_argument('--record', metavar='FILE', help='append every request and response to a jsonl file, secrets redacted')
+    parser.add_argument('--replay', metavar='FILE', help='answer calls from a --record file via a local stub instead of the api')
+    parser.add_argument('--latency', type=float, help='seconds the --replay stub waits per call (default: as recorded)')
+    commands = parser.add_subparsers(dest='group', metavar='command')
+    commands.add_parser('menu', help='interactive numbered menu')
+    stats = commands.add_parser('stats', help='per endpoint latency percentiles recorded in $MRR_METRICS')
+    stats.add_argument('--prometheus', action='store_true', help='print the Prometheus text format instead')
+    groups = {}
+    for endpoint in ENDPOINTS:
+        words = endpoint.name.split()
+        if group is not None and words[0] != group:
+            continue
+        if len(words) == 1:
+            command = commands.add_parser(words[0], help=endpoint.help)
+        else:
+            if words[0] not in groups:
+                groups[words[0]] = commands.add_parser(words[0], help=words[0] + ' endpoints').add_subparsers(dest='action', metavar='action', required=True)
+            command = groups[words[0]].add_parser(words[1], help=endpoint.help, description=NOTES.get(endpoint.command))
+        command.set_defaults(endpoint=endpoint)
+        for field in placeholders(endpoint.path):
+            command.add_argument(field, nargs='+' if field in ID_LISTS else None, help=FIELDS[field].help)
+        # Values stay strings here; endpoints.validate coerces them
+        for param in endpoint.params:
+            command.add_argument('--' + param.name, dest=param.name, help=param.help)
+    return parser
+
+# The command group named in argv, found without building any subcommand
+def requested_group(argv):
+    scout = argparse.ArgumentParser(add_help=False)
+    for option in ('--key', '--secret', '--format', '--batch', '--jobs', '--record', '--replay', '--latency'):
+        scout.add_argument(option)
+    scout.add_argument('group', nargs='?')
+    scout.add_argument('rest', nargs=argparse.REMAINDER)
+    group = scout.parse_known_args(argv)[0].group
+    return group if group in GROUPS else None
+
+def _json_default(value):
+    try:
+        return dict(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def succeeded(result):
+    return not isinstance(result, dict) or (result.get('success', True) and 'status' not in result)
+
+# Write a result as one json document or as one json line per record
+def emit(result, format, out=sys.stdout):
+    if format == 'json':
+        out.write(json.dumps(result, default=_json_default) + "\n")
+        return
+    data = result.get('data', result) if isinstance(result, dict) else result
+    if isinstance(data, list):
+        records = data
+    elif isinstance(result, dict) and 'errors' in result:
+        records = list(data.values()) + result['errors']
+    else:
+        records = [data]
+    for record in records:
+        out.write(json.dumps(record, default=_json_default) + "\n")
+
+# Run a jsonl file of commands over one client, writing one result line per command
+def run_batch(client, lines, jobs=1, out=sys.stdout):
+    def run(line):
+        values = json.loads(line)
+        command = values.pop('command', None)
+        try:
+            return {'command': command, 'result': call(client, BY_NAME[command], values)}
+        except Exception as error:
+            return {'command': command, 'error': repr(error)}
+    
+    failed = 0
+    lines = (line for line in lines if line.strip())
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for result in pool.map(run, lines):
+            failed += 'error' in result or not succeeded(result['result'])
+            out.write(json.dumps(result, default=_json_default) + "\n")
+    return 1 if failed else 0
+
+# Table of the per endpoint latencies saved under $MRR_METRICS, slowest total first
+def show_stats(path, prometheus=False, out=sys.stdout):
+    metrics = Metrics()
+    if path:
+        metrics.load(path)
+    if prometheus:
+        out.write(metrics.prometheus())
+        return 0
+    out.write(f"{'method':<7}{'endpoint':<36}{'calls':>7}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'retries':>8}{'bytes in':>11}\n")
+    for row in metrics.stats():
+        out.write(f"{row['method']:<7}{row['endpoint']:<36}{row['count']:>7}{row['total_s']:>9.2f}{row['p50_ms']:>9.1f}"
+                  f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['retries']:>8}{row['received']:>11}\n")
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser(requested_group(argv))
+    args = parser.parse_args(argv)
+    if args.batch is None and args.group in (None, 'menu'):
+        with MRR(args.key, args.secret, pretty=True, sink=print_sink) as client:
+            if os.environ.get("MRR_CACHE"):
+                client.cache = ResponseCache(path=os.environ["MRR_CACHE"])
+            return menu(client)
+    # Set MRR_METRICS to a json file to accumulate request metrics across runs
+    path = os.environ.get("MRR_METRICS")
+    if args.batch is None and args.group == 'stats':
+        return show_stats(path, args.prometheus)
+    if args.batch is None:
+        endpoint = args.endpoint
+        fields = placeholders(endpoint.path) + [param.name for param in endpoint.params]
+        values = {field: getattr(args, field) for field in fields}
+        # Badly typed path values and params are usage errors, not tracebacks
+        try:
+            validate(endpoint, values)
+        except ValueError as error:
+            parser.error(str(error))
+    
+    with MRR(args.key, args.secret) as client:
+        if os.environ.get("MRR_CACHE"):
+            client.cache = ResponseCache(path=os.environ["MRR_CACHE"])
+        if args.replay is not None:
+            client.root_uri = replay_server(args.replay, args.latency).url
+        if args.record is not None:
+            client.transport = Recorder(args.record, client.root_uri, (args.key, args.secret),
+                                        pool_connections=1, pool_maxsize=client.pool_size, pool_block=True)
+        metrics = Metrics()
+        if path:
+            client.hooks.append(metrics)
+        try:
+            if args.batch is not None:
+                with open(args.batch) as lines:
+                    return run_batch(client, lines, args.jobs)
+            result = call(client, endpoint, values)
+            emit(result, args.format)
+            return 0 if succeeded(result) else 1
+        finally:
+            if path:
+                metrics.save(path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
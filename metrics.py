@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+
+# Latency bucket upper bounds in seconds: 1ms doubling every 4 buckets up to
+# about 55s, so a quantile read back from the buckets is within ~19%
+BOUNDS = [0.001 * 2 ** (index / 4) for index in range(64)]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_ids = re.compile(r'/\d+(?:;\d+)*(?=/|$)')
+
+
+# "/rig/1;2;3/threads?pretty" -> "/rig/{id}/threads", so every call of an
+# endpoint lands in one series whatever ids it was made for
+def template(endpoint):
+    return _ids.sub('/{id}', endpoint.split("?")[0])
+
+
+def _series():
+    return {'count': 0, 'seconds': 0.0, 'buckets': [0] * (len(BOUNDS) + 1), 'statuses': {},
+            'retries': 0, 'sent': 0, 'received': 0}
+
+
+# Latency at quantile `q`, interpolated inside the bucket it falls in
+def quantile(series, q):
+    if not series['count']:
+        return None
+    rank = q * series['count']
+    seen = 0
+    for index, count in enumerate(series['buckets']):
+        if count and seen + count >= rank:
+            lower = BOUNDS[index - 1] if index else 0.0
+            if index == len(BOUNDS):
+                return lower
+            return lower + (BOUNDS[index] - lower) * (rank - seen) / count
+        seen += count
+    return BOUNDS[-1]
+
+
+# Request hook for MRR.hooks recording, per method and endpoint template, a
+# latency histogram, status counts, retries and bytes sent and received
+class Metrics:
+    def __init__(self):
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def before(self, type, endpoint, parms):
+        pass
+
+    # status is None when the request raised instead of answering
+    def after(self, type, endpoint, status, seconds, sent, received, retries):
+        name = (type, template(endpoint))
+        index = bisect_left(BOUNDS, seconds)
+        status = str(status) if status is not None else 'error'
+        with self._lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = _series()
+            series['count'] += 1
+            series['seconds'] += seconds
+            series['buckets'][index] += 1
+            series['statuses'][status] = series['statuses'].get(status, 0) + 1
+            series['retries'] += retries
+            series['sent'] += sent
+            series['received'] += received
+
+    # Add the series of a to_json() dump, e.g. one saved by an earlier run
+    def merge(self, dump):
+        with self._lock:
+            for entry in dump:
+                name = (entry['method'], entry['endpoint'])
+                series = self.series.get(name)
+                if series is None:
+                    series = self.series[name] = _series()
+                for field in ('count', 'seconds', 'retries', 'sent', 'received'):
+                    series[field] += entry[field]
+                for index, count in enumerate(entry['buckets']):
+                    series['buckets'][index] += count
+                for status, count in entry['statuses'].items():
+                    series['statuses'][status] = series['statuses'].get(status, 0) + count
+
+    def to_json(self):
+        with self._lock:
+            return [dict(series, method=method, endpoint=endpoint, buckets=list(series['buckets']),
+                         statuses=dict(series['statuses']))
+                    for (method, endpoint), series in sorted(self.series.items())]
+
+    # Per endpoint count, mean and p50/p95/p99 latency in ms, slowest total first
+    def stats(self):
+        rows = []
+        for entry in self.to_json():
+            row = {'method': entry['method'], 'endpoint': entry['endpoint'], 'count': entry['count'],
+                   'total_s': entry['seconds'], 'mean_ms': entry['seconds'] / entry['count'] * 1000}
+            for q in QUANTILES:
+                row['p%d_ms' % round(q * 100)] = quantile(entry, q) * 1000
+            row.update(retries=entry['retries'], sent=entry['sent'], received=entry['received'],
+                       statuses=entry['statuses'])
+            rows.append(row)
+        return sorted(rows, key=lambda row: -row['total_s'])
+
+    # Prometheus text exposition format
+    def prometheus(self):
+        dump = self.to_json()
+        lines = ["# TYPE mrr_request_duration_seconds histogram"]
+        for entry in dump:
+            labels = 'method="%s",endpoint="%s"' % (entry['method'], entry['endpoint'])
+            cumulative = 0
+            for bound, count in zip(BOUNDS + [None], entry['buckets']):
+                cumulative += count
+                le = "+Inf" if bound is None else "%.6g" % bound
+                lines.append('mrr_request_duration_seconds_bucket{%s,le="%s"} %d' % (labels, le, cumulative))
+            lines.append('mrr_request_duration_seconds_sum{%s} %.6f' % (labels, entry['seconds']))
+            lines.append('mrr_request_duration_seconds_count{%s} %d' % (labels, entry['count']))
+        for metric, field in (('mrr_request_retries_total', 'retries'), ('mrr_request_bytes_sent_total', 'sent'),
+                              ('mrr_response_bytes_received_total', 'received')):
+            lines.append("# TYPE %s counter" % metric)
+            for entry in dump:
+                lines.append('%s{method="%s",endpoint="%s"} %d' % (metric, entry['method'], entry['endpoint'], entry[field]))
+        lines.append("# TYPE mrr_responses_total counter")
+        for entry in dump:
+            for status, count in sorted(entry['statuses'].items()):
+                lines.append('mrr_responses_total{method="%s",endpoint="%s",status="%s"} %d'
+                             % (entry['method'], entry['endpoint'], status, count))
+        return "\n".join(lines) + "\n"
+
+    def load(self, path):
+        if os.path.exists(path):
+            with open(path) as saved:
+                self.merge(json.load(saved))
+
+    # Write everything recorded so far, added to what `path` already holds
+    def save(self, path):
+        total = Metrics()
+        total.load(path)
+        total.merge(self.to_json())
+        with open(path + ".tmp", 'w') as out:
+            json.dump(total.to_json(), out)
+        os.replace(path + ".tmp", path)
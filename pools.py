@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from main import MRR, MRRError, key, secret
+
+# Fields kept from a /account/pool/test result
+RESULT_FIELDS = ('source', 'dest', 'error', 'protocol', 'connection', 'sub', 'auth', 'red', 'diffs', 'diff',
+                 'work', 'ssl', 'xnonce', 'executiontime')
+
+
+def _truthy(value):
+    return value is True or str(value).lower() in ('true', '1', 'yes')
+
+
+# The api's definition of a pool that works with MRR: connection, sub, auth,
+# diffs and work true, red false and diff > 0. A simple test only checks connection.
+def compatible(result, method='full'):
+    if not _truthy(result.get('connection')):
+        return False
+    if method == 'simple':
+        return True
+    try:
+        diff = float(result.get('diff') or 0)
+    except (TypeError, ValueError):
+        diff = 0
+    return (all(_truthy(result.get(field)) for field in ('sub', 'auth', 'diffs', 'work'))
+            and not _truthy(result.get('red')) and diff > 0)
+
+
+# The test result in a /account/pool/test response, which may be wrapped in
+# 'result' and may be a one-element list
+def _result(data):
+    if isinstance(data, dict) and 'result' in data:
+        data = data['result']
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    return data if isinstance(data, dict) else {}
+
+
+# Cache key for a pool: what the test actually connects with
+def pool_id(pool):
+    return "%s:%s:%s" % (str(pool.get('host', '')).lower(), pool.get('port', ''), pool.get('user', ''))
+
+
+def pool_label(pool):
+    return str(pool.get('name') or pool.get('id') or "%s:%s" % (pool.get('host'), pool.get('port')))
+
+
+class PoolChecker:
+    # Runs /account/pool/test for pools x sources on up to `workers` threads.
+    # Tests of one pool host start at least `cooldown` seconds apart, and
+    # results are reused for `ttl` seconds (kept in the json file `path` if given).
+    def __init__(self, mrr, workers=4, cooldown=30, ttl=3600, path=None, clock=time.time):
+        self.mrr = mrr
+        self.workers = workers
+        self.cooldown = cooldown
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        # "pool id|source|method" -> result fields plus 'ok' and 'tested' (unix time)
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path) as saved:
+                self.results = json.load(saved)
+        # pool host -> monotonic time its next test may start
+        self._next = {}
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def save(self):
+        if self.path:
+            with self._lock:
+                results = dict(self.results)
+            with open(self.path, 'w') as out:
+                json.dump(results, out)
+
+    def _key(self, pool, source, method):
+        return "%s|%s|%s" % (pool_id(pool), source or '', method)
+
+    def _fresh(self, result):
+        return result is not None and self.clock() - result['tested'] < self.ttl
+
+    # The freshest unexpired result for a pool from any source and method, or
+    # only from `source` / `method` when given; None when there is none
+    def cached(self, pool, source=None, method=None):
+        prefix = pool_id(pool) + "|"
+        found = [result for name, result in self.results.items() if name.startswith(prefix) and self._fresh(result)
+                 and (source is None or result['source_name'] == source)
+                 and (method is None or result['method'] == method)]
+        return max(found, key=lambda result: result['tested']) if found else None
+
+    # True or False from the cache, None when the pool has no fresh result
+    def compatible(self, pool, source=None, method=None):
+        result = self.cached(pool, source, method)
+        return None if result is None else result['ok']
+
+    # A profile is usable unless every one of its pools is known incompatible
+    def profile_compatible(self, profile):
+        profile = str(profile)
+        if profile not in self._profiles:
+            record = self.mrr.get("/account/profile/" + profile)
+            if not record.get('success'):
+                raise MRRError(record)
+            self._profiles[profile] = record['data'].get('pools') or []
+        verdicts = [self.compatible(pool) for pool in self._profiles[profile]]
+        if verdicts and all(verdict is False for verdict in verdicts):
+            return False
+        return True if any(verdicts) else None
+
+    # Wait out the host's cooldown, reserving the next slot for this test
+    def _wait(self, pool):
+        host = str(pool.get('host', '')).lower()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.cooldown
+        time.sleep(start - now)
+
+    def test(self, pool, source=None, method='simple', fresh=False):
+        name = self._key(pool, source, method)
+        if not fresh and self._fresh(self.results.get(name)):
+            return self.results[name]
+        parms = {'method': method, 'host': pool.get('host'), 'port': pool.get('port'),
+                 'user': pool.get('user'), 'pass': pool.get('pass'), 'type': pool.get('type'), 'source': source}
+        if pool.get('extramethod'):
+            parms['extramethod'] = pool['extramethod']
+        parms = {field: value for field, value in parms.items() if value is not None}
+        self._wait(pool)
+        response = self.mrr.put("/account/pool/test", parms)
+        if not response.get('success'):
+            raise MRRError(response)
+        found = _result(response.get('data'))
+        result = {field: found[field] for field in RESULT_FIELDS if field in found}
+        result.update(ok=compatible(found, method), tested=self.clock(), method=method, source_name=source)
+        with self._lock:
+            self.results[name] = result
+        return result
+
+    # Test every pool from every source; returns [(pool, source, result or MRRError)].
+    # Work is ordered source-major so consecutive tests hit different pools.
+    def check(self, pools, sources=(None,), method='simple', fresh=False):
+        pairs = [(pool, source) for source, pool in itertools.product(sources, pools)]
+
+        def run(pair):
+            pool, source = pair
+            try:
+                return pool, source, self.test(pool, source, method, fresh)
+            except MRRError as error:
+                return pool, source, error
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(pairs)))) as executor:
+            checked = list(executor.map(run, pairs))
+        self.save()
+        return checked
+
+    def saved_pools(self):
+        response = self.mrr.get("/account/pool")
+        if not response.get('success'):
+            raise MRRError(response)
+        return response['data']
+
+    def servers(self):
+        response = self.mrr.get("/info/servers")
+        if not response.get('success'):
+            raise MRRError(response)
+        data = response['data']
+        servers = data.get('servers', []) if isinstance(data, dict) else data
+        return [server['name'] for server in servers]
+
+
+# {pool label: {source: true/false, or the error}} from check() output
+def matrix(checked):
+    table = {}
+    for pool, source, result in checked:
+        cell = str(result) if isinstance(result, Exception) else result['ok']
+        table.setdefault(pool_label(pool), {})[source or 'default'] = cell
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-pools", description="Test saved pools from several MRR servers at once")
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--method', choices=('simple', 'full'), default='simple')
+    parser.add_argument('--source', action='append', help='server to test from, repeatable -- see /info/servers')
+    parser.add_argument('--all-sources', action='store_true', help='test from every server in /info/servers')
+    parser.add_argument('--workers', type=int, default=4, help='tests in flight at once')
+    parser.add_argument('--cooldown', type=float, default=30, help='seconds between tests of the same pool host')
+    parser.add_argument('--ttl', type=float, default=3600, help='seconds a result is reused')
+    parser.add_argument('--fresh', action='store_true', help='ignore cached results')
+    parser.add_argument('--cache', default='mrr_pools.json', help='json file keeping results between runs')
+    args = parser.parse_args(argv)
+    with MRR(args.key, args.secret) as client:
+        checker = PoolChecker(client, args.workers, args.cooldown, args.ttl, args.cache)
+        sources = checker.servers() if args.all_sources else args.source or [None]
+        checked = checker.check(checker.saved_pools(), sources, args.method, args.fresh)
+    print(json.dumps(matrix(checked), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
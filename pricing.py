@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sys
+
+from fleet import BATCH_SIZE
+from main import MRR, MRRError, key, secret
+from scanner import UNITS
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# Numeric leaves of a nested record, keyed by dotted path
+def _numbers(record, prefix=""):
+    found = {}
+    if isinstance(record, dict):
+        for name, value in record.items():
+            found.update(_numbers(value, prefix + str(name) + "."))
+    elif isinstance(record, (int, float, str)) and not isinstance(record, bool):
+        try:
+            found[prefix.rstrip(".")] = float(record)
+        except ValueError:
+            pass
+    return found
+
+
+# Market inputs per algo from the /info/algos and /pricing payloads:
+# {algo: {'suggested': price per unit/day, 'unit': 'th', 'inputs': {name: number}}}
+def market_snapshot(algos, pricing):
+    snapshot = {}
+    for algo in algos or []:
+        name = str(algo.get('name', '')).lower()
+        suggested = algo.get('suggested_price') or {}
+        unit = str(suggested.get('unit', 'mh*day')).split('*')[0].lower()
+        snapshot[name] = {
+            'suggested': _float(suggested.get('amount')),
+            'unit': unit,
+            'inputs': _numbers({'suggested': suggested.get('amount'), 'stats': algo.get('stats')}),
+        }
+    # /pricing rates may be keyed by algo at the top level or under a currency
+    for outer, rates in (pricing or {}).items():
+        entries = rates.items() if isinstance(rates, dict) and str(outer).lower() not in snapshot else [(outer, rates)]
+        for name, value in entries:
+            market = snapshot.get(str(name).lower())
+            if market is not None:
+                market['inputs'].update(_numbers(value, "pricing.%s." % outer))
+    return snapshot
+
+
+# Largest relative change between two sets of market inputs
+def delta(old, new):
+    moved = 0.0
+    for name in set(old) | set(new):
+        before, after = old.get(name, 0.0), new.get(name, 0.0)
+        if before != after:
+            moved = max(moved, abs(after - before) / max(abs(before), abs(after)))
+    return moved
+
+
+class Repricer:
+    # Target price = suggested price x multiplier, converted to the rig's
+    # price unit and clamped to [floor, ceiling] (per algo overrides allowed)
+    def __init__(self, mrr, currency='BTC', multiplier=1.0, multipliers={}, floor=0.0, ceiling=None,
+                 threshold=0.02, state_path=None):
+        self.mrr = mrr
+        self.currency = currency
+        self.multiplier = multiplier
+        self.multipliers = dict(multipliers)
+        self.floor = floor
+        self.ceiling = ceiling
+        # Relative change in an algo's inputs needed before its rigs are repriced
+        self.threshold = threshold
+        # Optional json file keeping the snapshot between runs
+        self.state_path = state_path
+        # algo -> market inputs the rigs of that algo were last priced against
+        self.priced = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as state:
+                self.priced = json.load(state)
+
+    def save(self):
+        if self.state_path:
+            with open(self.state_path, 'w') as state:
+                json.dump(self.priced, state)
+
+    def fetch_market(self):
+        algos = self.mrr.get("/info/algos")
+        pricing = self.mrr.get("/pricing")
+        for response in (algos, pricing):
+            if not response.get('success'):
+                raise MRRError(response)
+        return market_snapshot(algos['data'], pricing['data'])
+
+    def target(self, rig, market, algo):
+        unit = str((rig.get('price') or {}).get('type', 'mh')).lower()
+        price = market['suggested'] * UNITS.get(unit, 1e6) / UNITS.get(market['unit'], 1e6)
+        price *= self.multipliers.get(algo, self.multiplier)
+        price = max(price, self.floor)
+        if self.ceiling is not None:
+            price = min(price, self.ceiling)
+        return price
+
+    # Algos whose inputs moved past the threshold since their rigs were last
+    # priced. Algos without a positive suggested price are never repriced.
+    def moved(self, market):
+        return [algo for algo, current in market.items() if current['suggested'] > 0
+                and (algo not in self.priced or delta(self.priced[algo], current['inputs']) > self.threshold)]
+
+    # /rig/batch entries for rigs of moved algos whose price differs from the target
+    def updates(self, rigs, market):
+        by_algo = {}
+        for rig in rigs:
+            by_algo.setdefault(str(rig.get('type', '')).lower(), []).append(rig)
+        updates = []
+        moved = self.moved(market)
+        for algo in moved:
+            for rig in by_algo.get(algo, ()):
+                price = round(self.target(rig, market[algo], algo), 8)
+                current = ((rig.get('price') or {}).get(self.currency) or {}).get('price')
+                if _float(current, None) != price:
+                    updates.append({'id': int(rig['id']), 'price': {self.currency.lower(): {'price': price}}})
+        return updates, moved
+
+    def reprice(self, rigs=None, dry_run=False):
+        market = self.fetch_market()
+        if rigs is None:
+            mine = self.mrr.get("/rig/mine")
+            if not mine.get('success'):
+                raise MRRError(mine)
+            rigs = mine['data']
+        updates, moved = self.updates(rigs, market)
+        results = []
+        failed = set()
+        if not dry_run:
+            algo_of = {int(rig['id']): str(rig.get('type', '')).lower() for rig in rigs}
+            for start in range(0, len(updates), BATCH_SIZE):
+                chunk = updates[start:start + BATCH_SIZE]
+                result = self.mrr.post("/rig/batch", {'rigs': chunk})
+                results.append(result)
+                if not result.get('success'):
+                    failed.update(algo_of[update['id']] for update in chunk)
+            # Algos with a failed batch are retried on the next run whatever the market does
+            for algo in moved:
+                if algo not in failed:
+                    self.priced[algo] = market[algo]['inputs']
+            self.save()
+        return {'moved': moved, 'updates': updates, 'results': results, 'failed': sorted(failed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-pricing", description="Reprice your rigs from /info/algos and /pricing")
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--currency', default='BTC')
+    parser.add_argument('--multiplier', type=float, default=1.0, help='target price as a multiple of the suggested price')
+    parser.add_argument('--floor', type=float, default=0.0)
+    parser.add_argument('--ceiling', type=float)
+    parser.add_argument('--threshold', type=float, default=0.02, help='relative market move that triggers repricing an algo')
+    parser.add_argument('--state', default='mrr_pricing.json', help='file keeping the last market snapshot')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+    with MRR(args.key, args.secret) as client:
+        repricer = Repricer(client, args.currency, args.multiplier, floor=args.floor, ceiling=args.ceiling,
+                            threshold=args.threshold, state_path=args.state)
+        report = repricer.reprice(dry_run=args.dry_run)
+    print(json.dumps(report, indent=2, default=str))
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
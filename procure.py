@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from endpoints import BY_NAME, call
+from main import MRR, MRRError, key, secret
+from pricing import market_snapshot
+from scanner import TH, UNITS, Scanner
+
+# rigs: [{'id', 'hashrate' (H/s), 'price' (per TH/day), 'cost'}], hashrate the
+# total they deliver, cost the total for the rental length, feasible whether
+# they meet the target within the budget
+Plan = namedtuple('Plan', 'rigs hashrate cost feasible')
+
+
+# What renting `hashrate` H/s at `price` per TH/day costs for `hours`
+def rental_cost(price, hashrate, hours):
+    return price * hashrate / TH * hours / 24
+
+
+# Cheapest set of items (hashrate, cost) delivering at least `need` H/s, or None.
+# Hashrates are floored to need/resolution steps, so a solution always covers
+# `need`; O(len(items) x resolution).
+def cover(items, need, resolution=500):
+    step = need / resolution
+    weights = [min(resolution, int(hashrate // step)) for hashrate, cost in items]
+    best = [0.0] + [float('inf')] * resolution
+    taken = []
+    for weight, (hashrate, cost) in zip(weights, items):
+        took = bytearray(resolution + 1)
+        if weight:
+            for units in range(resolution, 0, -1):
+                total = best[max(0, units - weight)] + cost
+                if total < best[units]:
+                    best[units] = total
+                    took[units] = 1
+        taken.append(took)
+    if best[resolution] == float('inf'):
+        return None
+    chosen = []
+    units = resolution
+    for index in range(len(items) - 1, -1, -1):
+        if units and taken[index][units]:
+            chosen.append(index)
+            units = max(0, units - weights[index])
+    return chosen[::-1]
+
+
+# Rigs (listing rows, cheapest per TH first) covering `target` H/s for `hours`
+# at the lowest cost. Greedy fill in price order, then an exact pass over the
+# last `back` greedy picks and the next `ahead` candidates, which fixes the
+# overshoot of the last few rigs the greedy fill takes.
+def optimize(rows, target, hours, budget=None, back=16, ahead=256, resolution=500):
+    costs = [rental_cost(row['price'], row['hashrate'], hours) for row in rows]
+    total = 0.0
+    end = 0
+    while end < len(rows) and total < target:
+        total += rows[end]['hashrate']
+        end += 1
+    chosen = list(range(end))
+    if total >= target and end:
+        core = list(range(max(0, end - back)))
+        window = list(range(len(core), min(len(rows), end + ahead)))
+        need = target - sum(rows[i]['hashrate'] for i in core)
+        picked = cover([(rows[i]['hashrate'], costs[i]) for i in window], need, resolution)
+        if picked is not None:
+            exact = core + [window[i] for i in picked]
+            if sum(costs[i] for i in exact) < sum(costs[i] for i in chosen):
+                chosen = exact
+    cost = sum(costs[i] for i in chosen)
+    hashrate = sum(rows[i]['hashrate'] for i in chosen)
+    feasible = hashrate >= target and (budget is None or cost <= budget)
+    if budget is not None and cost > budget:
+        # Best effort: the most hashrate the budget buys, cheapest per TH first
+        chosen = []
+        cost = 0.0
+        for i in range(len(rows)):
+            if cost + costs[i] <= budget:
+                chosen.append(i)
+                cost += costs[i]
+        hashrate = sum(rows[i]['hashrate'] for i in chosen)
+    return Plan([dict(rows[i], cost=costs[i]) for i in chosen], hashrate, cost, feasible)
+
+
+class Procurer:
+    # Plans and places rentals of `algo` rigs. Each PUT /rental caps rate.price
+    # at the planned price plus `slippage`, so a rig repriced since the listing
+    # was read is not rented at the new price.
+    def __init__(self, mrr, algo, currency='BTC', profile=None, slippage=0.02, workers=4, filters={}):
+        self.mrr = mrr
+        self.algo = algo.lower()
+        self.currency = currency
+        self.profile = profile
+        self.slippage = slippage
+        self.workers = workers
+        self.scanner = Scanner(mrr, [self.algo], currency, workers=workers, filters=filters)
+
+    # Suggested price per TH/day for the algo from /info/algos, or None
+    def suggested(self):
+        response = self.mrr.get("/info/algos")
+        if not response.get('success'):
+            raise MRRError(response)
+        market = market_snapshot(response['data'], {}).get(self.algo)
+        if market is None or not market['suggested']:
+            return None
+        return market['suggested'] * TH / UNITS.get(market['unit'], 1e6)
+
+    # Available rigs rentable for `hours`, cheapest per TH first
+    def candidates(self, hours, min_rpi=0, max_price=None, exclude=()):
+        self.scanner.refresh()
+        listing = self.scanner.listings[self.algo]
+        exclude = set(exclude)
+        rows = (listing.row(i) for i in listing.select(hours=hours, min_rpi=min_rpi, max_price=max_price))
+        return [row for row in rows if row['id'] not in exclude and row['hashrate'] > 0]
+
+    def plan(self, target, hours, budget=None, min_rpi=0, max_premium=None, exclude=()):
+        max_price = None
+        if max_premium is not None:
+            suggested = self.suggested()
+            max_price = suggested * max_premium if suggested else None
+        return optimize(self.candidates(hours, min_rpi, max_price, exclude), target, hours, budget)
+
+    # PUT /rental for every planned rig at once; returns {rig id: response}
+    def rent(self, plan, hours):
+        def place(rig):
+            values = {'rig': rig['id'], 'length': hours, 'currency': self.currency, 'profile': self.profile,
+                      'rate.type': 'th', 'rate.price': round(rig['price'] * (1 + self.slippage), 8)}
+            # A failure on one rig must not lose the rentals already placed for the others
+            try:
+                return rig['id'], call(self.mrr, BY_NAME['rental create'], values)
+            except (ValueError, requests.RequestException) as error:
+                return rig['id'], {'success': False, 'data': {'message': repr(error)}}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(pool.map(place, plan.rigs))
+
+    # Plan, rent, and re-plan the shortfall without the rigs that could not be
+    # rented, up to `rounds` times. A plan that misses the target or the budget
+    # is only rented with allow_partial; otherwise the report says why it was refused.
+    def procure(self, target, hours, budget=None, dry_run=False, rounds=2, allow_partial=False, **options):
+        plan = self.plan(target, hours, budget, **options)
+        report = {'plans': [plan._asdict()], 'rented': [], 'failed': {}, 'hashrate': 0.0, 'cost': 0.0,
+                  'refused': None}
+        need, allowance = target, budget
+        if dry_run:
+            return report
+        for attempt in range(rounds):
+            if not plan.feasible and not allow_partial:
+                report['refused'] = "plan %d delivers %.6g of %.6g H/s for %.8g%s" % (
+                    len(report['plans']), plan.hashrate, need, plan.cost,
+                    "" if allowance is None else " against a budget of %.8g" % allowance)
+                break
+            results = self.rent(plan, hours)
+            for rig in plan.rigs:
+                result = results[rig['id']]
+                if result.get('success'):
+                    report['rented'].append(rig)
+                    report['hashrate'] += rig['hashrate']
+                    report['cost'] += rig['cost']
+                else:
+                    report['failed'][rig['id']] = result
+            shortfall = target - report['hashrate']
+            if shortfall <= 0 or attempt == rounds - 1:
+                break
+            remaining = None if budget is None else budget - report['cost']
+            exclude = [rig['id'] for rig in report['rented']] + list(report['failed'])
+            need, allowance = shortfall, remaining
+            plan = self.plan(need, hours, remaining, exclude=exclude, **options)
+            if not plan.rigs:
+                break
+            report['plans'].append(plan._asdict())
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-procure", description="Rent the cheapest set of rigs meeting a hashrate target")
+    parser.add_argument('algo', help='algo type name, e.g. sha256')
+    parser.add_argument('hashrate', type=float, help='target hashrate in --unit')
+    parser.add_argument('hours', type=float, help='rental length')
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--unit', choices=sorted(UNITS), default='th')
+    parser.add_argument('--currency', default='BTC')
+    parser.add_argument('--budget', type=float, help='most to spend in total, in --currency')
+    parser.add_argument('--profile', type=int, help='pool profile applied to the rentals')
+    parser.add_argument('--min-rpi', type=float, default=0)
+    parser.add_argument('--max-premium', type=float, help='skip rigs priced over this multiple of the suggested price')
+    parser.add_argument('--slippage', type=float, default=0.02, help='relative price rise accepted between plan and rental')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help='print the plan without renting')
+    parser.add_argument('--allow-partial', action='store_true',
+                        help='rent a plan even when it misses the target or the budget')
+    args = parser.parse_args(argv)
+    with MRR(args.key, args.secret) as client:
+        procurer = Procurer(client, args.algo, args.currency, args.profile, args.slippage, args.workers)
+        report = procurer.procure(args.hashrate * UNITS[args.unit], args.hours, args.budget, args.dry_run,
+                                  allow_partial=args.allow_partial, min_rpi=args.min_rpi, max_premium=args.max_premium)
+    print(json.dumps(report, indent=2, default=str))
+    return 0 if args.dry_run or report['hashrate'] >= args.hashrate * UNITS[args.unit] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
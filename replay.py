@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+# Request headers that would let a recording sign calls of its own
+SECRET_HEADERS = ('x-api-key', 'x-api-sign')
+REDACTED = "REDACTED"
+
+
+# Default stub reply: an empty successful api response for any endpoint
+def ok_responder(method, path, body):
+    return 200, {'success': True, 'data': {}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the stub honours keep-alive like the real api
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status, payload = self.server.responder(self.command, self.path, body)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_PUT = do_POST = do_DELETE = reply
+
+    def log_message(self, *args):
+        pass
+
+
+# Local stand-in for the api, served from a background thread
+def stub_server(responder=ok_responder, latency=0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.responder = responder
+    server.latency = latency
+    server.url = "http://127.0.0.1:%d" % server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Transport for MRR.transport that passes every request through and appends
+# the exchange to a jsonl file: method, endpoint (relative to the api root),
+# request headers and body, status, elapsed seconds and response text. The
+# key, the signature and any of `secrets` found anywhere are redacted.
+class Recorder(HTTPAdapter):
+    def __init__(self, path, root_uri, secrets=(), **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.root = urlsplit(root_uri).path.rstrip("/")
+        self.secrets = [secret for secret in secrets if secret]
+        self._lock = threading.Lock()
+
+    def redact(self, text):
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        url = urlsplit(request.url)
+        endpoint = url.path[len(self.root):] if url.path.startswith(self.root) else url.path
+        body = request.body or b''
+        headers = {name: REDACTED if name.lower() in SECRET_HEADERS else value
+                   for name, value in request.headers.items()}
+        exchange = {
+            'method': request.method,
+            'endpoint': endpoint + ("?" + url.query if url.query else ""),
+            'headers': headers,
+            'body': body.decode() if isinstance(body, bytes) else body,
+            'status': response.status_code,
+            'seconds': response.elapsed.total_seconds(),
+            # Reading the body here keeps it readable for streamed calls too
+            'data': response.text,
+        }
+        line = self.redact(json.dumps(exchange)) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as out:
+                out.write(line)
+        return response
+
+
+def load(path):
+    with open(path) as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+# Stub responder answering from recorded exchanges. A request is matched on
+# method, endpoint and body, else on method and endpoint alone; repeats of a
+# request get its recorded answers in order, the last one over and over.
+def replay_responder(exchanges):
+    exact = {}
+    loose = {}
+    for exchange in exchanges:
+        body = _canonical(exchange['body'])
+        exact.setdefault((exchange['method'], exchange['endpoint'], body), []).append(exchange)
+        loose.setdefault((exchange['method'], exchange['endpoint']), []).append(exchange)
+    served = {}
+    lock = threading.Lock()
+
+    def respond(method, path, body):
+        name = (method, path, _canonical(body.decode()))
+        answers = exact.get(name)
+        if answers is None:
+            name = (method, path)
+            answers = loose.get(name)
+        if answers is None:
+            return 404, {'success': False, 'data': {'message': "not recorded: %s %s" % (method, path)}}
+        with lock:
+            index = served.get(name, 0)
+            served[name] = index + 1
+        exchange = answers[min(index, len(answers) - 1)]
+        return exchange['status'], exchange['data'].encode()
+
+    return respond
+
+
+# Serve a recording at `latency` seconds per call, or at the latency each
+# exchange was recorded with when latency is None
+def replay_server(path, latency=0):
+    exchanges = load(path)
+    responder = replay_responder(exchanges)
+    if latency is None:
+        recorded = {}
+        for exchange in exchanges:
+            recorded.setdefault((exchange['method'], exchange['endpoint']), exchange['seconds'])
+
+        def respond(method, path, body):
+            time.sleep(recorded.get((method, path), 0))
+            return responder(method, path, body)
+
+        return stub_server(respond)
+    return stub_server(responder, latency)
+
+
+def _canonical(body):
+    try:
+        return json.dumps(json.loads(body), sort_keys=True) if body else ""
+    except ValueError:
+        return body
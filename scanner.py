@@ -0,0 +1,189 @@
+import hashlib
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from fastjson import loads
+from main import MRRError
+
+# Hashes per second for each rate/hashrate unit the api uses
+UNITS = {
+    'hash': 1.0,
+    'kh': 1e3,
+    'mh': 1e6,
+    'gh': 1e9,
+    'th': 1e12,
+    'ph': 1e15,
+}
+TH = UNITS['th']
+
+# Rig status codes stored in the index
+AVAILABLE, RENTED, OFFLINE = 0, 1, 2
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def rig_status(rig):
+    status = rig.get('status') or {}
+    if status.get('rented') or status.get('status') == 'rented':
+        return RENTED
+    if status.get('online') is False or status.get('status') in ('offline', 'disabled'):
+        return OFFLINE
+    return AVAILABLE
+
+
+# Advertised hashrate of a /rig record in hashes per second
+def rig_hashrate(rig):
+    advertised = (rig.get('hashrate') or {}).get('advertised') or {}
+    return _float(advertised.get('hash')) * UNITS.get(str(advertised.get('type', 'mh')).lower(), 1e6)
+
+
+# Measured hashrate of a /rig record in hashes per second over `window`
+# ('last_5min', 'last_15min' or 'last_30min', sent when /rig/mine is asked
+# for hashrate), or the advertised hashrate when the record has none
+def rig_measured_hashrate(rig, window='last_5min'):
+    measured = (rig.get('hashrate') or {}).get(window)
+    if not measured:
+        return rig_hashrate(rig)
+    return _float(measured.get('hash')) * UNITS.get(str(measured.get('type', 'mh')).lower(), 1e6)
+
+
+# Price per TH per day of a /rig record in the given currency, or None if not offered
+def rig_price(rig, currency):
+    price = rig.get('price') or {}
+    offer = price.get(currency) or {}
+    if not offer.get('enabled', True) or 'price' not in offer:
+        return None
+    unit = UNITS.get(str(price.get('type', 'mh')).lower(), 1e6)
+    return _float(offer['price']) * TH / unit
+
+
+class Listing:
+    # Columnar index of one algo's marketplace listing, sorted by price per TH/day
+    __slots__ = ('ids', 'price', 'hashrate', 'minhours', 'maxhours', 'rpi', 'status', 'records')
+
+    def __init__(self, rigs, currency):
+        rows = []
+        for rig in rigs:
+            price = rig_price(rig, currency)
+            if price is None:
+                continue
+            rows.append((price, int(rig['id']), rig_hashrate(rig), _float(rig.get('minhours')),
+                         _float(rig.get('maxhours')), _float(rig.get('rpi')), rig_status(rig)))
+        rows.sort()
+        self.price = array('d', (row[0] for row in rows))
+        self.ids = array('q', (row[1] for row in rows))
+        self.hashrate = array('d', (row[2] for row in rows))
+        self.minhours = array('d', (row[3] for row in rows))
+        self.maxhours = array('d', (row[4] for row in rows))
+        self.rpi = array('d', (row[5] for row in rows))
+        self.status = array('b', (row[6] for row in rows))
+        self.records = len(rows)
+
+    # Rows in price order matching the filters; price order lets top-k stop early
+    def select(self, k=None, hours=None, min_hashrate=0, min_rpi=0, max_price=None, available=True):
+        found = []
+        for i in range(self.records):
+            if max_price is not None and self.price[i] > max_price:
+                break
+            if available and self.status[i] != AVAILABLE:
+                continue
+            if hours is not None and not self.minhours[i] <= hours <= self.maxhours[i]:
+                continue
+            if self.hashrate[i] < min_hashrate or self.rpi[i] < min_rpi:
+                continue
+            found.append(i)
+            if k is not None and len(found) == k:
+                break
+        return found
+
+    def row(self, i):
+        return {
+            'id': self.ids[i],
+            'price': self.price[i],
+            'hashrate': self.hashrate[i],
+            'minhours': self.minhours[i],
+            'maxhours': self.maxhours[i],
+            'rpi': self.rpi[i],
+            'status': self.status[i],
+        }
+
+
+class Scanner:
+    def __init__(self, mrr, algos, currency='BTC', page_size=100, max_age=0, workers=4, filters={}):
+        self.mrr = mrr
+        self.algos = [algo.lower() for algo in algos]
+        self.currency = currency
+        self.page_size = page_size
+        # Pages fetched less than max_age seconds ago are not re-fetched
+        self.max_age = max_age
+        self.workers = workers
+        # Extra /rig search filters (minhours, rpi, region, ...) sent with every page
+        self.filters = dict(filters)
+        self.listings = {}
+        # (algo, offset) -> [fetched at, etag, digest, listing count, records]
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    # Returns (records, listing count, changed) for one page of an algo's listing
+    def _fetch(self, algo, offset):
+        key = (algo, offset)
+        page = self._pages.get(key)
+        if page is not None and time.monotonic() - page[0] < self.max_age:
+            return page[4], page[3], False
+        headers = {'If-None-Match': page[1]} if page is not None and page[1] else None
+        parms = dict(self.filters, type=algo, count=self.page_size, offset=offset)
+        response = self.mrr.query("GET", "/rig", parms, headers=headers)
+        if response['status'] == 304:
+            page[0] = time.monotonic()
+            return page[4], page[3], False
+        if response['status'] != 200:
+            raise MRRError(response)
+        digest = hashlib.sha1(response['data'].encode()).digest()
+        if page is not None and page[2] == digest:
+            page[0] = time.monotonic()
+            return page[4], page[3], False
+        body = loads(response['data'])
+        if not body.get('success'):
+            raise MRRError(body)
+        records = body['data'].get('records') or []
+        count = int(body['data'].get('count') or 0)
+        with self._lock:
+            self._pages[key] = [time.monotonic(), response['header'].get('ETag'), digest, count, records]
+        return records, count, True
+
+    def _refresh_algo(self, algo, pool):
+        records, count, changed = self._fetch(algo, 0)
+        pages = [records]
+        offsets = range(self.page_size, count, self.page_size)
+        for records, _, moved in pool.map(lambda offset: self._fetch(algo, offset), offsets):
+            pages.append(records)
+            changed = changed or moved
+        # Forget pages past the end when the listing shrank
+        end = max(count, self.page_size)
+        with self._lock:
+            for key in [key for key in self._pages if key[0] == algo and key[1] >= end]:
+                del self._pages[key]
+        if changed or algo not in self.listings:
+            self.listings[algo] = Listing((rig for records in pages for rig in records), self.currency)
+        return changed
+
+    # Re-fetch stale pages for every algo concurrently and rebuild only the
+    # indexes whose pages changed. Returns the algos that changed.
+    def refresh(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool, \
+                ThreadPoolExecutor(max_workers=len(self.algos) or 1) as algo_pool:
+            changed = list(algo_pool.map(lambda algo: self._refresh_algo(algo, pool), self.algos))
+        return [algo for algo, moved in zip(self.algos, changed) if moved]
+
+    # Cheapest k rigs per TH/day for an algo that can be rented for `hours`
+    def top_k(self, algo, k=10, hours=None, min_hashrate=0, min_rpi=0, max_price=None, available=True):
+        listing = self.listings[algo.lower()]
+        found = listing.select(k, hours, min_hashrate, min_rpi, max_price, available)
+        return [listing.row(i) for i in found]
@@ -0,0 +1,160 @@
+import fnmatch
+import heapq
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# (requests per second, burst) per endpoint group; 'default' covers the rest
+DEFAULT_LIMITS = {
+    'default': (10, 20),
+}
+
+# (method, endpoint pattern, priority) -- lower goes first, first match wins.
+# Unmatched writes get WRITE_PRIORITY and reads READ_PRIORITY.
+DEFAULT_PRIORITIES = [
+    ("PUT", "/rental/*/extend", 0),
+    ("PUT", "/rig/*/extend", 0),
+    ("POST", "/rig/batch/extend", 0),
+]
+WRITE_PRIORITY = 1
+READ_PRIORITY = 2
+
+# Statuses worth another attempt; writes are only retried on 429 since
+# the api refused them before doing anything
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    # Take a token and return 0, or return the seconds until one is available
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Scheduler:
+    def __init__(self, limits=DEFAULT_LIMITS, priorities=DEFAULT_PRIORITIES,
+                 retries=3, backoff=0.5, max_backoff=30):
+        self.limits = dict(DEFAULT_LIMITS, **limits)
+        self.priorities = list(priorities)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.started = time.monotonic()
+        self._buckets = {}
+        self._waiting = {}
+        self._metrics = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    # Endpoint group used for rate limiting: the first path segment ("rig", "rental", ...)
+    def group(self, endpoint):
+        group = endpoint.split("?")[0].strip("/").split("/")[0]
+        return group if group in self.limits else 'default'
+
+    def priority(self, type, endpoint):
+        path = endpoint.split("?")[0]
+        for method, pattern, priority in self.priorities:
+            if method == type and fnmatch.fnmatchcase(path, pattern):
+                return priority
+        return READ_PRIORITY if type == "GET" else WRITE_PRIORITY
+
+    def _stats(self, group):
+        if group not in self._metrics:
+            self._metrics[group] = {'requests': 0, 'retries': 0, 'failures': 0, 'throttled': 0.0}
+        return self._metrics[group]
+
+    # Block until this call is the most urgent one waiting on its group and a token is free
+    def _acquire(self, group, priority):
+        with self._cond:
+            if group not in self._buckets:
+                self._buckets[group] = TokenBucket(*self.limits[group])
+                self._waiting[group] = []
+            bucket = self._buckets[group]
+            waiting = self._waiting[group]
+            ticket = (priority, next(self._seq))
+            heapq.heappush(waiting, ticket)
+            began = time.monotonic()
+            while True:
+                if waiting[0] == ticket:
+                    wait = bucket.take()
+                    if not wait:
+                        heapq.heappop(waiting)
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            self._stats(group)['throttled'] += time.monotonic() - began
+
+    # Seconds before retry `attempt`: a readable Retry-After (seconds or an HTTP
+    # date), else jittered exponential backoff, never more than max_backoff
+    def delay(self, attempt, response=None):
+        value = response.headers.get('Retry-After') if response is not None else None
+        if value:
+            try:
+                return min(self.max_backoff, max(0.0, float(value)))
+            except ValueError:
+                pass
+            try:
+                return min(self.max_backoff, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+            except (TypeError, ValueError, IndexError):
+                pass
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1)
+
+    # Run send() (one signed request returning a requests.Response) under the
+    # rate limit, retrying on throttling, server errors and, for GETs, connection errors
+    def submit(self, type, endpoint, send):
+        group = self.group(endpoint)
+        priority = self.priority(type, endpoint)
+        for attempt in range(self.retries + 1):
+            self._acquire(group, priority)
+            with self._cond:
+                self._stats(group)['requests'] += 1
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if type != "GET" or attempt == self.retries:
+                    with self._cond:
+                        self._stats(group)['failures'] += 1
+                    raise
+                response = None
+            else:
+                retry = response.status_code == 429 or (type == "GET" and response.status_code in RETRY_STATUSES)
+                if not retry or attempt == self.retries:
+                    if response.status_code >= 400:
+                        with self._cond:
+                            self._stats(group)['failures'] += 1
+                    return response
+            with self._cond:
+                self._stats(group)['retries'] += 1
+            wait = self.delay(attempt, response)
+            # Hand the connection back to the pool: a streamed response keeps it
+            # until read or closed. Reading the short error body lets it be reused.
+            if response is not None:
+                response.content
+                response.close()
+            time.sleep(wait)
+
+    # Per group request, retry and failure counts, seconds spent throttled and throughput
+    def metrics(self):
+        elapsed = time.monotonic() - self.started
+        with self._cond:
+            return {
+                group: dict(stats, per_second=stats['requests'] / elapsed if elapsed else 0.0)
+                for group, stats in self._metrics.items()
+            }
@@ -0,0 +1,101 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import endpoints
+from main import MRR, LogSink
+from replay import StubHandler, stub_server
+
+# A valid value per param type
+SAMPLE_VALUES = {
+    'ids': "1;2",
+    'int': 1,
+    'float': 1.5,
+    'str': "x",
+    'bool': True,
+    'json': [{'id': 1}],
+    'algo': "sha256",
+}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    seen = []
+
+    def respond(method, path, body):
+        seen.append((method, path))
+        return 200, {'success': True, 'data': {}}
+
+    server = stub_server(respond)
+    with MRR("key", "secret") as mrr:
+        mrr.root_uri = server.url
+        yield mrr, seen
+    server.shutdown()
+
+
+# Every registry entry sends one request with the method and path it declares
+@pytest.mark.parametrize('endpoint', endpoints.ENDPOINTS, ids=lambda endpoint: endpoint.name)
+def test_registry_entry(stub, endpoint):
+    mrr, seen = stub
+    del seen[:]
+    endpoints.call(mrr, endpoint, {param.name: SAMPLE_VALUES[param.type] for param in endpoints.fields(endpoint)})
+    path = endpoint.path.format(ids="1;2", rigids="1;2", id=1, algo="SHA256", priority=1)
+    assert seen == [(endpoint.method, path)]
+
+
+def test_bad_path_value_names_the_endpoint():
+    with pytest.raises(ValueError, match="profile get: bad id"):
+        endpoints.validate(endpoints.BY_NAME['profile get'], {'id': "abc"})
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError, match="unknown parameters"):
+        endpoints.validate(endpoints.BY_NAME['profile get'], {'id': 1, 'color': "red"})
+
+
+def test_log_sink_writes_at_default_settings():
+    out = io.StringIO()
+    sink = LogSink(handler=logging.StreamHandler(out))
+    sink("GET", "/whoami", "{}")
+    sink.close()
+    assert out.getvalue() == "GET /whoami : {}\n"
+    assert not logging.getLogger("mrr.responses").handlers
+
+
+# Many threads sharing one MRR and a LogSink: every nonce is unique, every
+# reply reaches the thread that asked for it and every response the sink
+def test_shared_client_across_threads(monkeypatch, threads=8, calls=50):
+    nonces = []
+    logged = []
+
+    def respond(method, path, body):
+        return 200, {'success': True, 'data': {'path': path}}
+
+    def reply(handler):
+        nonces.append(handler.headers['x-api-nonce'])
+        StubHandler.reply(handler)
+
+    class Handler(logging.Handler):
+        def emit(self, record):
+            logged.append(record)
+
+    monkeypatch.setattr(StubHandler, 'do_GET', reply)
+    server = stub_server(respond)
+    sink = LogSink(handler=Handler())
+    try:
+        with MRR("key", "secret", pool_size=threads, sink=sink) as mrr:
+            mrr.root_uri = server.url
+
+            def worker(index):
+                paths = ["/rig/%d" % (index * calls + call) for call in range(calls)]
+                return [mrr.get(path)['data']['path'] for path in paths] == paths
+
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                assert all(pool.map(worker, range(threads)))
+    finally:
+        sink.close()
+        server.shutdown()
+    assert len(nonces) == len(set(nonces)) == threads * calls
+    assert len(logged) == threads * calls
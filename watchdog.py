@@ -0,0 +1,306 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+import graph
+from main import MRR, key, secret
+from pools import PoolChecker
+
+logger = logging.getLogger("mrr.watchdog")
+
+# A policy decision: 'extend', 'profile', 'pool' or 'alert' for one rental
+Action = namedtuple('Action', 'kind rental parms reason')
+
+# Multi-id endpoint each action kind is applied through
+ACTION_PATHS = {
+    'extend': "/rental/{ids}/extend",
+    'profile': "/rental/{ids}/profile",
+    'pool': "/rental/{ids}/pool",
+}
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# Hours left on a rental from its 'end' time ("2023-08-10 12:00:00" UTC), or None
+def remaining_hours(rental, now):
+    end = str(rental.get('end') or '').replace(' UTC', '')
+    for format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            ends = datetime.strptime(end, format).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+        return (ends - now) / 3600
+    return None
+
+
+class RentalState:
+    # Rolling view of one active rental, kept between cycles
+    __slots__ = ('id', 'percent', 'history', 'remaining',
+                 'uptime', 'graph_at', 'low_cycles', 'acted')
+
+    def __init__(self, id, window):
+        self.id = id
+        self.percent = 0.0
+        # Recent average-hashrate percentages, newest last
+        self.history = deque(maxlen=window)
+        self.remaining = None
+        self.uptime = None
+        self.graph_at = 0
+        self.low_cycles = 0
+        # action kind -> time it was last applied
+        self.acted = {}
+
+    def rolling_percent(self):
+        return sum(self.history) / len(self.history) if self.history else 0.0
+
+
+class Extend:
+    # Buy `length` more hours when fewer than `below` remain and the rig is delivering
+    def __init__(self, below, length, min_percent=90):
+        self.below = below
+        self.length = length
+        self.min_percent = min_percent
+
+    def check(self, state):
+        if state.remaining is not None and state.remaining < self.below and state.rolling_percent() >= self.min_percent:
+            return Action('extend', state.id, {'length': self.length},
+                          "%.1fh left at %.0f%%" % (state.remaining, state.rolling_percent()))
+
+
+class SwitchProfile:
+    # Apply a fallback pool profile after `cycles` polls under `min_percent`.
+    # With a pools.PoolChecker, a profile whose pools all failed their last
+    # test is reported instead of applied.
+    def __init__(self, profile, min_percent=50, cycles=3, checker=None):
+        self.profile = profile
+        self.min_percent = min_percent
+        self.cycles = cycles
+        self.checker = checker
+
+    def check(self, state):
+        if state.low_cycles >= self.cycles and state.percent < self.min_percent:
+            if self.checker is not None and self.checker.profile_compatible(self.profile) is False:
+                return Action('alert', state.id, {}, "fallback profile %s failed its pool tests" % self.profile)
+            return Action('profile', state.id, {'profile': self.profile},
+                          "%.0f%% for %d polls" % (state.percent, state.low_cycles))
+
+
+class SwitchPool:
+    # Add a fallback pool (host, port, user, pass, priority) after `cycles` polls
+    # under `min_percent`, unless a pools.PoolChecker knows the pool to be incompatible
+    def __init__(self, pool, min_percent=50, cycles=3, checker=None):
+        self.pool = dict(pool)
+        self.min_percent = min_percent
+        self.cycles = cycles
+        self.checker = checker
+
+    def check(self, state):
+        if state.low_cycles >= self.cycles and state.percent < self.min_percent:
+            if self.checker is not None and self.checker.compatible(self.pool) is False:
+                return Action('alert', state.id, {}, "fallback pool %s failed its pool test" % self.pool.get('host'))
+            return Action('pool', state.id, self.pool, "%.0f%% for %d polls" % (state.percent, state.low_cycles))
+
+
+class Alert:
+    # Report rentals under `min_percent` hashrate or `min_uptime` graph uptime
+    def __init__(self, min_percent=80, min_uptime=0.9):
+        self.min_percent = min_percent
+        self.min_uptime = min_uptime
+
+    def check(self, state):
+        if state.history and state.rolling_percent() < self.min_percent:
+            return Action('alert', state.id, {}, "rolling hashrate %.0f%%" % state.rolling_percent())
+        if state.uptime is not None and state.uptime < self.min_uptime:
+            return Action('alert', state.id, {}, "uptime %.1f%%" % (state.uptime * 100))
+
+
+class Watchdog:
+    def __init__(self, mrr, rules, interval=60, window=30, graph_interval=900,
+                 suspect_percent=90, cooldown=1800, clock=time.time, alert=logger.warning):
+        self.mrr = mrr
+        self.rules = list(rules)
+        self.interval = interval
+        self.window = window
+        # Graphs are costly for the api: refetch one only when the rental looks
+        # unhealthy and its last graph is older than graph_interval seconds
+        self.graph_interval = graph_interval
+        self.suspect_percent = suspect_percent
+        # Seconds before the same kind of action is applied to a rental again
+        self.cooldown = cooldown
+        self.clock = clock
+        self.alert = alert
+        self.rentals = {}
+
+    # Refresh rental states from one listing pass
+    def poll(self, now):
+        seen = set()
+        for rental in self.mrr.iter_rentals(type='renter', history=False):
+            id = str(rental['id'])
+            seen.add(id)
+            state = self.rentals.get(id)
+            if state is None:
+                state = self.rentals[id] = RentalState(id, self.window)
+            state.percent = _float(((rental.get('hashrate') or {}).get('average') or {}).get('percent'))
+            state.history.append(state.percent)
+            state.low_cycles = state.low_cycles + 1 if state.percent < self.suspect_percent else 0
+            state.remaining = remaining_hours(rental, now)
+        # Rentals that ended drop out of the active listing
+        for id in set(self.rentals) - seen:
+            del self.rentals[id]
+
+    def refresh_graphs(self, now):
+        stale = [state.id for state in self.rentals.values()
+                 if state.low_cycles and now - state.graph_at >= self.graph_interval]
+        if not stale:
+            return
+        for id, parsed in self.mrr.rental_graphs(stale).items():
+            state = self.rentals.get(str(id))
+            if state is None:
+                continue
+            state.graph_at = now
+            state.uptime = graph.uptime(parsed)
+
+    # Group identical actions so each group is one multi-id request
+    def apply(self, actions, now):
+        groups = {}
+        for action in actions:
+            state = self.rentals[action.rental]
+            if now - state.acted.get(action.kind, -self.cooldown) < self.cooldown:
+                continue
+            if action.kind == 'alert':
+                state.acted[action.kind] = now
+                self.alert("rental %s: %s", action.rental, action.reason)
+                continue
+            logger.info("rental %s: %s (%s)", action.rental, action.kind, action.reason)
+            groups.setdefault((action.kind, json.dumps(action.parms, sort_keys=True)), []).append(action.rental)
+        for (kind, parms), ids in groups.items():
+            result = self.mrr.batch("PUT", ACTION_PATHS[kind], ids, json.loads(parms))
+            # A failed chunk leaves its ids out of the data; only the ids that
+            # went through start the cooldown, the others are tried again next cycle
+            done = set(ids) if result['success'] else {id for name in result['data'] if name
+                                                       for id in str(name).split(";")}
+            for id in ids:
+                if id in done:
+                    self.rentals[id].acted[kind] = now
+                else:
+                    self.alert("rental %s: %s failed: %s", id, kind, result['errors'])
+
+    def cycle(self):
+        now = self.clock()
+        self.poll(now)
+        self.refresh_graphs(now)
+        actions = [action for state in self.rentals.values() for rule in self.rules
+                   for action in [rule.check(state)] if action is not None]
+        self.apply(actions, now)
+        return actions
+
+    def run(self, cycles=None):
+        count = 0
+        while cycles is None or count < cycles:
+            began = time.monotonic()
+            try:
+                self.cycle()
+            except Exception:
+                logger.exception("watchdog cycle failed")
+            count += 1
+            if cycles is None or count < cycles:
+                time.sleep(max(0, self.interval - (time.monotonic() - began)))
+
+
+class ReplayMRR:
+    # Stands in for MRR from a recorded fixture: {"cycles": [{"time": unix seconds,
+    # "rentals": [...], "graphs": {id: chartdata}}, ...]}. Each listing pass moves
+    # to the next cycle and writes are recorded in `sent` instead of being sent.
+    def __init__(self, cycles):
+        self.cycles = cycles
+        self.index = -1
+        self.sent = []
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fixture:
+            return cls(json.load(fixture)['cycles'])
+
+    # Time of the cycle the next listing pass serves: Watchdog.cycle reads the
+    # clock before poll() moves the fixture on
+    @property
+    def now(self):
+        return self.cycles[min(self.index + 1, len(self.cycles) - 1)]['time']
+
+    def iter_rentals(self, **filters):
+        self.index = min(self.index + 1, len(self.cycles) - 1)
+        return iter(self.cycles[self.index]['rentals'])
+
+    def rental_graphs(self, ids, parms={}):
+        graphs = self.cycles[self.index].get('graphs', {})
+        return {str(id): graph.parse_graph(graphs[str(id)]) for id in ids if str(id) in graphs}
+
+    def batch(self, type, template, ids, parms={}):
+        self.sent.append((type, template.format(ids=";".join(ids)), parms))
+        return {'success': True, 'data': {}, 'errors': []}
+
+
+def build_rules(args, checker=None):
+    rules = [Alert(args.alert_percent, args.alert_uptime)]
+    if args.extend_below:
+        rules.append(Extend(args.extend_below, args.extend_length, args.extend_percent))
+    if args.profile:
+        rules.append(SwitchProfile(args.profile, args.switch_percent, args.switch_cycles, checker))
+    if args.pool_host:
+        pool = {'host': args.pool_host, 'port': args.pool_port, 'user': args.pool_user, 'pass': args.pool_pass,
+                'priority': args.pool_priority}
+        rules.append(SwitchPool({field: value for field, value in pool.items() if value is not None},
+                                args.switch_percent, args.switch_cycles, checker))
+    return rules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mrr-watchdog", description="Monitor active rentals and apply extend/failover rules")
+    parser.add_argument('--key', default=os.environ.get('MRR_KEY', key))
+    parser.add_argument('--secret', default=os.environ.get('MRR_SECRET', secret))
+    parser.add_argument('--interval', type=float, default=60, help='seconds between polls')
+    parser.add_argument('--cycles', type=int, help='stop after this many polls')
+    parser.add_argument('--extend-below', type=float, help='extend rentals with fewer hours left than this')
+    parser.add_argument('--extend-length', type=float, default=1, help='hours to extend by')
+    parser.add_argument('--extend-percent', type=float, default=90, help='only extend rentals hashing at least this %%')
+    parser.add_argument('--profile', type=int, help='pool profile to switch underperforming rentals to')
+    parser.add_argument('--pool-host', help='fallback pool to put on underperforming rentals')
+    parser.add_argument('--pool-port', type=int)
+    parser.add_argument('--pool-user')
+    parser.add_argument('--pool-pass')
+    parser.add_argument('--pool-priority', type=int, default=0, help='priority the fallback pool replaces (0-4)')
+    parser.add_argument('--switch-percent', type=float, default=50)
+    parser.add_argument('--switch-cycles', type=int, default=3)
+    parser.add_argument('--alert-percent', type=float, default=80)
+    parser.add_argument('--alert-uptime', type=float, default=0.9)
+    parser.add_argument('--pool-cache', metavar='FILE', help='results saved by pools.py; profiles and pools that failed are not applied')
+    parser.add_argument('--replay', metavar='FIXTURE', help='run offline against a recorded fixture instead of the api')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.replay:
+        client = ReplayMRR.load(args.replay)
+        watchdog = Watchdog(client, build_rules(args), interval=0, clock=lambda: client.now)
+        watchdog.run(args.cycles or len(client.cycles))
+        for request in client.sent:
+            print(json.dumps(request))
+        return 0
+
+    with MRR(args.key, args.secret) as client:
+        checker = PoolChecker(client, path=args.pool_cache) if args.pool_cache else None
+        Watchdog(client, build_rules(args, checker), interval=args.interval).run(args.cycles)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())